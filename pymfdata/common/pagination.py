@@ -0,0 +1,33 @@
+import base64
+import json
+
+from dataclasses import dataclass, field
+from typing import Any, Generic, List, Optional, TypeVar
+
+_IT = TypeVar("_IT")    # Item Type
+
+
+@dataclass
+class Page(Generic[_IT]):
+    items: List[_IT] = field(default_factory=list)
+    next_cursor: Optional[str] = None
+
+    @property
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+
+def encode_cursor(values: List[Any]) -> str:
+    raw = json.dumps(values, default=str, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> List[Any]:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except ValueError as e:
+        raise ValueError("Invalid page cursor: {}".format(cursor)) from e
+
+    if not isinstance(values, list):
+        raise ValueError("Invalid page cursor: {}".format(cursor))
+    return values
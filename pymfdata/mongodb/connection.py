@@ -1,15 +1,167 @@
-from motor.motor_asyncio import AsyncIOMotorClient
-from typing import Union
+import logging
+import threading
+import time
+
+from dataclasses import dataclass
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorCollection, AsyncIOMotorDatabase
+from pymongo import monitoring
+from pymongo.read_preferences import _ServerMode
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Set, Tuple, Union
+
+from pymfdata.mongodb.index import Index, diff_indexes
+
+logger = logging.getLogger("pymfdata.mongodb.index")
+
+
+@dataclass(frozen=True)
+class MotorPoolConfig:
+    max_pool_size: int = 100
+    min_pool_size: int = 0
+    max_idle_time_ms: Optional[int] = None
+    wait_queue_timeout_ms: Optional[int] = None
+    compressors: Optional[Sequence[str]] = None     # "zstd", "snappy", "zlib"
+
+    def client_kwargs(self) -> Dict[str, Any]:
+        kwargs: Dict[str, Any] = {"maxPoolSize": self.max_pool_size, "minPoolSize": self.min_pool_size}
+        if self.max_idle_time_ms is not None:
+            kwargs["maxIdleTimeMS"] = self.max_idle_time_ms
+        if self.wait_queue_timeout_ms is not None:
+            kwargs["waitQueueTimeoutMS"] = self.wait_queue_timeout_ms
+        if self.compressors:
+            kwargs["compressors"] = ",".join(self.compressors)
+        return kwargs
+
+
+class MotorPoolStats(NamedTuple):
+    open: int
+    checked_out: int
+    idle: int
+    created: int
+    closed: int
+    checkout_failures: int
+    wait_total: float
+    wait_count: int
+
+
+class _PoolStatsListener(monitoring.ConnectionPoolListener):
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.open = self.checked_out = self.created = self.closed = self.checkout_failures = 0
+        self.wait_total, self.wait_count = 0.0, 0
+
+    def stats(self) -> MotorPoolStats:
+        with self._lock:
+            return MotorPoolStats(self.open, self.checked_out, max(0, self.open - self.checked_out), self.created,
+                                  self.closed, self.checkout_failures, self.wait_total, self.wait_count)
+
+    def connection_created(self, event) -> None:
+        with self._lock:
+            self.open += 1
+            self.created += 1
+
+    def connection_closed(self, event) -> None:
+        with self._lock:
+            self.open = max(0, self.open - 1)
+            self.closed += 1
+
+    def connection_check_out_started(self, event) -> None:
+        self._local.started = time.perf_counter()
+
+    def connection_checked_out(self, event) -> None:
+        wait = time.perf_counter() - getattr(self._local, "started", time.perf_counter())
+        with self._lock:
+            self.checked_out += 1
+            self.wait_total += wait
+            self.wait_count += 1
+
+    def connection_check_out_failed(self, event) -> None:
+        with self._lock:
+            self.checkout_failures += 1
+
+    def connection_checked_in(self, event) -> None:
+        with self._lock:
+            self.checked_out = max(0, self.checked_out - 1)
+
+    def pool_created(self, event) -> None:
+        pass
+
+    def pool_cleared(self, event) -> None:
+        pass
+
+    def pool_closed(self, event) -> None:
+        pass
+
+    def connection_ready(self, event) -> None:
+        pass
 
 
 class AsyncMotor:
-    def __init__(self, db_name, db_uri: str) -> None:
+    def __init__(self, db_name, db_uri: str, read_preference: Optional[_ServerMode] = None,
+                 dev_mode: bool = False) -> None:
         self._db_uri = db_uri
         self.db_name = db_name
+        self.read_preference = read_preference
+        self.dev_mode = dev_mode        # explain repository queries and warn on collection scans
+        self._explained: Set[Tuple[str, str]] = set()
         self.client: Union[AsyncIOMotorClient, None] = None
+        self._pool_listener = _PoolStatsListener()
+        self._handles: Dict[Tuple[str, Optional[str], Optional[str]], Any] = {}
+        self._indexes: Dict[str, List[Index]] = {}     # declared by the repositories built with this motor
+
+    async def connect(self, pool: Optional[MotorPoolConfig] = None, **kwargs):
+        if pool is not None:
+            kwargs = {**pool.client_kwargs(), **kwargs}
 
-    async def connect(self):
-        self.client = AsyncIOMotorClient(self._db_uri)
+        event_listeners = [*kwargs.pop("event_listeners", []), self._pool_listener]
+        self.client = AsyncIOMotorClient(self._db_uri, event_listeners=event_listeners, **kwargs)
+        self._handles.clear()
+
+    async def warm_up(self) -> None:
+        await self.client.admin.command("ping")
 
     async def disconnect(self):
         self.client.close()
+        self._handles.clear()
+
+    def database(self, read_preference: Optional[_ServerMode] = None) -> AsyncIOMotorDatabase:
+        key = (self.db_name, None, repr(read_preference) if read_preference is not None else None)
+        if key not in self._handles:
+            assert self.client is not None
+            self._handles[key] = self.client.get_database(self.db_name, read_preference=read_preference)
+        return self._handles[key]
+
+    def collection(self, name: str, read_preference: Optional[_ServerMode] = None) -> AsyncIOMotorCollection:
+        key = (self.db_name, name, repr(read_preference) if read_preference is not None else None)
+        if key not in self._handles:
+            self._handles[key] = self.database(read_preference)[name]
+        return self._handles[key]
+
+    def declare_indexes(self, collection_name: str, indexes: Sequence[Index]) -> None:
+        declared = self._indexes.setdefault(collection_name, [])
+        names = {index.index_name for index in declared}
+        declared.extend(index for index in indexes if index.index_name not in names)
+
+    def declared_indexes(self) -> Dict[str, List[Index]]:
+        return {name: list(indexes) for name, indexes in self._indexes.items()}
+
+    async def ensure_indexes(self, background: bool = True) -> Dict[str, List[str]]:
+        created: Dict[str, List[str]] = {}
+        for collection_name, indexes in self.declared_indexes().items():
+            collection = self.collection(collection_name)
+            diff = diff_indexes(indexes, {index["name"]: index async for index in collection.list_indexes()})
+
+            for index in diff.changed_ttl:
+                await self.database().command("collMod", collection_name, index={
+                    "name": index.index_name, "expireAfterSeconds": index.expire_after_seconds})
+            for index, current in diff.conflicts:
+                logger.warning("Index %s.%s differs from its declaration (keys %s, options %s), drop it to rebuild",
+                               collection_name, index.index_name, dict(index.key_pattern), index.options)
+
+            if diff.missing:    # background is ignored by MongoDB 4.2+, which always uses the optimized build
+                created[collection_name] = await collection.create_indexes(
+                    [index.to_model(background) for index in diff.missing])
+        return created
+
+    def pool_stats(self) -> MotorPoolStats:
+        return self._pool_listener.stats()
@@ -0,0 +1,85 @@
+from dataclasses import dataclass
+from pymongo import ASCENDING, IndexModel
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+_Keys = Sequence[Union[str, Tuple[str, Union[int, str]]]]     # "field", "-field" or (field, direction)
+
+
+@dataclass(frozen=True)
+class Index:
+    keys: _Keys
+    name: Optional[str] = None
+    unique: bool = False
+    sparse: bool = False
+    expire_after_seconds: Optional[int] = None      # TTL index
+    partial_filter: Optional[dict] = None
+
+    @property
+    def key_pattern(self) -> List[Tuple[str, Union[int, str]]]:
+        pattern = []
+        for key in self.keys:
+            if isinstance(key, str):
+                key = (key.lstrip("-"), -1 if key.startswith("-") else ASCENDING)
+            pattern.append(tuple(key))
+        return pattern
+
+    @property
+    def index_name(self) -> str:
+        return self.name or "_".join("{}_{}".format(field, direction) for field, direction in self.key_pattern)
+
+    @property
+    def options(self) -> Dict[str, Any]:
+        return {"unique": self.unique, "sparse": self.sparse, "expireAfterSeconds": self.expire_after_seconds,
+                "partialFilterExpression": self.partial_filter}
+
+    def to_model(self, background: bool = True) -> IndexModel:
+        options = {"name": self.index_name, "background": background}
+        if self.unique:
+            options["unique"] = True
+        if self.sparse:
+            options["sparse"] = True
+        if self.expire_after_seconds is not None:
+            options["expireAfterSeconds"] = self.expire_after_seconds
+        if self.partial_filter is not None:
+            options["partialFilterExpression"] = self.partial_filter
+        return IndexModel(self.key_pattern, **options)
+
+
+class IndexDiff(NamedTuple):
+    missing: List[Index]
+    changed_ttl: List[Index]                    # applied in place with collMod
+    conflicts: List[Tuple[Index, dict]]         # declared index and the existing index document
+
+
+def _existing_options(index: dict) -> Dict[str, Any]:
+    return {"unique": bool(index.get("unique", False)), "sparse": bool(index.get("sparse", False)),
+            "expireAfterSeconds": index.get("expireAfterSeconds"),
+            "partialFilterExpression": index.get("partialFilterExpression")}
+
+
+def diff_indexes(declared: Sequence[Index], existing: Dict[str, dict]) -> IndexDiff:
+    diff = IndexDiff([], [], [])
+    for index in declared:
+        current = existing.get(index.index_name)
+        if current is None:
+            diff.missing.append(index)
+            continue
+
+        options = _existing_options(current)
+        changed = {key for key, value in index.options.items() if options[key] != value}
+        if list(current["key"].items()) != index.key_pattern:
+            diff.conflicts.append((index, current))
+        elif changed == {"expireAfterSeconds"} and None not in (options["expireAfterSeconds"],
+                                                                 index.expire_after_seconds):
+            diff.changed_ttl.append(index)
+        elif changed:
+            diff.conflicts.append((index, current))
+    return diff
+
+
+def has_collscan(plan) -> bool:
+    if isinstance(plan, dict):
+        return plan.get("stage") == "COLLSCAN" or any(has_collscan(value) for value in plan.values())
+    if isinstance(plan, list):
+        return any(has_collscan(value) for value in plan)
+    return False
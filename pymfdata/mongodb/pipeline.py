@@ -0,0 +1,54 @@
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+_Projection = Union[Sequence[str], dict]
+
+
+def _field_path(field: str) -> str:
+    return field if field.startswith("$") else "$" + field
+
+
+class Pipeline:
+    def __init__(self, stages: Optional[Sequence[dict]] = None) -> None:
+        self._stages: List[dict] = list(stages or [])
+
+    def _add(self, stage: dict) -> "Pipeline":
+        return Pipeline([*self._stages, stage])
+
+    def match(self, filter: dict) -> "Pipeline":
+        return self._add({"$match": filter})
+
+    def project(self, projection: _Projection) -> "Pipeline":
+        if not isinstance(projection, dict):
+            projection = {field: 1 for field in projection}
+        return self._add({"$project": projection})
+
+    def group(self, key: Union[None, str, dict], **accumulators: dict) -> "Pipeline":
+        return self._add({"$group": {"_id": _field_path(key) if isinstance(key, str) else key, **accumulators}})
+
+    def sort(self, *fields: str) -> "Pipeline":
+        return self._add({"$sort": {field.lstrip("-"): -1 if field.startswith("-") else 1 for field in fields}})
+
+    def skip(self, count: int) -> "Pipeline":
+        return self._add({"$skip": count})
+
+    def limit(self, count: int) -> "Pipeline":
+        return self._add({"$limit": count})
+
+    def lookup(self, from_: str, local_field: str, foreign_field: str, as_: str) -> "Pipeline":
+        return self._add({"$lookup": {"from": from_, "localField": local_field, "foreignField": foreign_field,
+                                      "as": as_}})
+
+    def unwind(self, field: str, preserve_empty: bool = False) -> "Pipeline":
+        return self._add({"$unwind": {"path": _field_path(field), "preserveNullAndEmptyArrays": preserve_empty}})
+
+    def stage(self, stage: Dict[str, Any]) -> "Pipeline":
+        return self._add(stage)
+
+    def build(self) -> List[dict]:
+        return list(self._stages)
+
+    def __iter__(self):
+        return iter(self._stages)
+
+    def __len__(self) -> int:
+        return len(self._stages)
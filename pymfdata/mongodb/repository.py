@@ -1,32 +1,168 @@
+import logging
+
 from abc import ABC
 from bson import ObjectId
-from typing import final, List, Optional
+from motor.motor_asyncio import AsyncIOMotorClientSession, AsyncIOMotorCollection
+from pymongo import ASCENDING, DESCENDING, ReturnDocument
+from pymongo.operations import DeleteMany, DeleteOne, InsertOne, ReplaceOne, UpdateMany, UpdateOne
+from pymongo.read_preferences import _ServerMode
+from typing import final, AsyncIterator, ClassVar, Dict, List, NamedTuple, Optional, Sequence, Tuple, Union
 
+from pymfdata.common.pagination import Page, decode_cursor, encode_cursor
 from pymfdata.mongodb.connection import AsyncMotor
+from pymfdata.mongodb.index import Index, has_collscan
+from pymfdata.mongodb.pipeline import Pipeline
+from pymfdata.mongodb.usecase import current_session
+
+_Projection = Union[Sequence[str], dict]
+_Sort = Sequence[Tuple[str, int]]
+_Hint = Union[str, Sequence[Tuple[str, int]]]     # index name or key pattern
+_WriteOperation = Union[InsertOne, UpdateOne, UpdateMany, ReplaceOne, DeleteOne, DeleteMany]
+
+logger = logging.getLogger("pymfdata.mongodb.explain")
+
+
+class BulkWriteSummary(NamedTuple):
+    inserted_count: int
+    matched_count: int
+    modified_count: int
+    deleted_count: int
+    upserted_ids: Dict[int, ObjectId]
+
+
+def _range_filter(filter: Optional[dict], after: Optional[str], descending: bool) -> dict:
+    filter = dict(filter or {})
+    if after is None:
+        return filter
+
+    values = decode_cursor(after)
+    if len(values) != 1:
+        raise ValueError("Invalid page cursor: {}".format(after))
+
+    seek = {"_id": {"$lt" if descending else "$gt": ObjectId(values[0])}}
+    return {"$and": [filter, seek]} if "_id" in filter else {**filter, **seek}
+
+
+def _page_projection(projection: Optional[_Projection]) -> Optional[_Projection]:
+    if isinstance(projection, dict) and not projection.get("_id", True):
+        return {**projection, "_id": True}      # the page cursor is built from _id
+    return projection
+
+
+def _query_shape(filter: Optional[dict], sort: Optional[_Sort]) -> str:
+    def shape(value):
+        if isinstance(value, dict):
+            return {key: shape(item) for key, item in sorted(value.items())}
+        if isinstance(value, (list, tuple)):
+            return [shape(item) for item in value]
+        return None
+
+    return repr((shape(filter or {}), [field for field, _ in sort or ()]))
 
 
 class AsyncRepository(ABC):
+    _read_preference: ClassVar[Optional[_ServerMode]] = None
+    _indexes: ClassVar[Sequence[Index]] = ()
+
     def __init__(self, collection_name: str, motor: AsyncMotor) -> None:
-        self._collection = motor.client[motor.db_name][collection_name]
+        self._collection_name = collection_name
+        self._motor = motor
+        motor.declare_indexes(collection_name, self._indexes)
+
+    @property
+    def _collection(self) -> AsyncIOMotorCollection:
+        return self._motor.collection(self._collection_name)
+
+    @property
+    def _session(self) -> Optional[AsyncIOMotorClientSession]:
+        return current_session(self._motor.client)
+
+    @property
+    def _in_transaction(self) -> bool:
+        session = self._session
+        return session is not None and session.in_transaction
+
+    @property
+    def _reader(self) -> AsyncIOMotorCollection:
+        if self._in_transaction:
+            return self._collection     # reads in a transaction must use the primary
+
+        read_preference = self._read_preference or self._motor.read_preference
+        return self._motor.collection(self._collection_name, read_preference)
+
+    async def _explain(self, filter: Optional[dict], sort: Optional[_Sort] = None,
+                       hint: Optional[_Hint] = None) -> None:
+        if not self._motor.dev_mode or self._in_transaction:
+            return
+
+        key = (self._collection_name, _query_shape(filter, sort))
+        if key in self._motor._explained:
+            return
+        self._motor._explained.add(key)
+
+        plan = await self._reader.find(filter or {}, sort=sort, hint=hint).explain()
+        if has_collscan(plan.get("queryPlanner", {}).get("winningPlan")):
+            logger.warning("COLLSCAN on %s for filter %s, sort %s", self._collection_name, filter, sort)
 
     @final
     async def delete_by_id(self, item_id: str) -> bool:
-        row = await self._collection.delete_one({"_id": ObjectId(item_id)})
+        row = await self._collection.delete_one({"_id": ObjectId(item_id)}, session=self._session)
         if not row:
             return False
 
         return True
 
     @final
-    async def find_all(self) -> List[dict]:
-        cursor = self._collection.find()
-        results = list(map(lambda item: item, await cursor.to_list(length=100)))
+    async def find_all(self, filter: Optional[dict] = None, projection: Optional[_Projection] = None,
+                       sort: Optional[_Sort] = None, limit: int = 0, batch_size: int = 1000,
+                       hint: Optional[_Hint] = None) -> AsyncIterator[dict]:
+        await self._explain(filter, sort, hint)
+        cursor = self._reader.find(filter or {}, projection, sort=sort, limit=limit, batch_size=batch_size, hint=hint,
+                                   session=self._session)
+        async for item in cursor:
+            yield item
+
+    @final
+    async def find_page(self, after: Optional[str] = None, limit: int = 20, filter: Optional[dict] = None,
+                        projection: Optional[_Projection] = None, descending: bool = False,
+                        hint: Optional[_Hint] = None) -> Page[dict]:
+        await self._explain(filter, [("_id", DESCENDING if descending else ASCENDING)], hint)
+        cursor = self._reader.find(_range_filter(filter, after, descending), _page_projection(projection),
+                                   sort=[("_id", DESCENDING if descending else ASCENDING)], limit=limit + 1, hint=hint,
+                                   session=self._session)
+        items: List[dict] = await cursor.to_list(length=limit + 1)
+        if len(items) <= limit:
+            return Page(items=items)
+
+        items = items[:limit]
+        return Page(items=items, next_cursor=encode_cursor([str(items[-1]["_id"])]))
+
+    @final
+    async def aggregate_stream(self, pipeline: Union[Pipeline, Sequence[dict]], batch_size: int = 1000,
+                               hint: Optional[_Hint] = None, allow_disk_use: bool = False) -> AsyncIterator[dict]:
+        options = {"batchSize": batch_size, "allowDiskUse": allow_disk_use}
+        if hint is not None:
+            options["hint"] = hint
 
-        return results
+        async for item in self._reader.aggregate(list(pipeline), session=self._session, **options):
+            yield item
+
+    @final
+    async def count(self, filter: Optional[dict] = None, hint: Optional[_Hint] = None) -> int:
+        if not filter and hint is None and not self._in_transaction:
+            return await self._reader.estimated_document_count()
+
+        await self._explain(filter, hint=hint)
+        return await self._reader.count_documents(filter or {}, session=self._session,
+                                                  **({"hint": hint} if hint is not None else {}))
+
+    @final
+    async def distinct(self, key: str, filter: Optional[dict] = None) -> list:
+        return await self._reader.distinct(key, filter, session=self._session)
 
     @final
     async def find_by_id(self, item_id: str) -> Optional[dict]:
-        row = await self._collection.find_one({"_id": ObjectId(item_id)})
+        row = await self._reader.find_one({"_id": ObjectId(item_id)}, session=self._session)
         if not row:
             return None
 
@@ -34,9 +170,39 @@ class AsyncRepository(ABC):
 
     @final
     async def save(self, req: dict) -> dict:
-        return await self._collection.insert_one(req)
+        return await self._collection.insert_one(req, session=self._session)
+
+    @final
+    async def save_all(self, items: Sequence[dict], ordered: bool = False) -> List[ObjectId]:
+        if not items:
+            return []
+
+        result = await self._collection.insert_many(items, ordered=ordered, session=self._session)
+        return result.inserted_ids
+
+    @final
+    async def bulk_write(self, operations: Sequence[_WriteOperation], ordered: bool = False) -> BulkWriteSummary:
+        if not operations:
+            return BulkWriteSummary(0, 0, 0, 0, {})
+
+        # PyMongo splits the batches at maxWriteBatchSize and the message size limit itself
+        result = await self._collection.bulk_write(list(operations), ordered=ordered, session=self._session)
+        return BulkWriteSummary(result.inserted_count, result.matched_count, result.modified_count,
+                                result.deleted_count, dict(result.upserted_ids))
+
+    @final
+    async def upsert_by_id(self, item_id: str, req: dict) -> bool:
+        result = await self._collection.update_one({"_id": ObjectId(item_id)}, req, upsert=True,
+                                                   session=self._session)
+        return result.upserted_id is not None
+
+    @final
+    async def update_and_return(self, filter: dict, req: dict, projection: Optional[_Projection] = None,
+                                upsert: bool = False, return_before: bool = False) -> Optional[dict]:
+        return await self._collection.find_one_and_update(
+            filter, req, projection, upsert=upsert, session=self._session,
+            return_document=ReturnDocument.BEFORE if return_before else ReturnDocument.AFTER)
 
     @final
-    async def update_by_id(self, item_id: str, req: dict) -> dict:
-        await self._collection.update_one({"_id": ObjectId(item_id)}, req)
-        return await self.find_by_id(item_id)
+    async def update_by_id(self, item_id: str, req: dict) -> Optional[dict]:
+        return await self.update_and_return({"_id": ObjectId(item_id)}, req)
@@ -0,0 +1,41 @@
+import asyncio
+import logging
+
+from pymongo.errors import PyMongoError
+
+from pymfdata.mongodb.usecase import current_session
+
+TRANSIENT_TRANSACTION_ERROR = "TransientTransactionError"
+
+logger = logging.getLogger("pymfdata.mongodb.retry")
+
+
+def async_transactional(read_only: bool = False, max_attempts: int = 3, backoff: float = 0.05,
+                        max_backoff: float = 1.0):
+    def decorator(func):
+        async def wrapper(self, *args, **kwargs):
+            if current_session(self.uow.motor.client) is not None:
+                async with self.uow:
+                    return await func(self, *args, **kwargs)
+
+            attempt = 0
+            while True:
+                attempt += 1
+                try:
+                    async with self.uow:
+                        if not read_only:
+                            self.uow.begin()
+
+                        result = await func(self, *args, **kwargs)
+                        await self.uow.commit()
+                        return result
+                except PyMongoError as e:
+                    if attempt >= max_attempts or not e.has_error_label(TRANSIENT_TRANSACTION_ERROR):
+                        raise
+                    logger.warning("Retrying transaction (attempt %d of %d) after %r", attempt + 1, max_attempts, e)
+
+                await asyncio.sleep(min(max_backoff, backoff * 2 ** (attempt - 1)))
+
+        return wrapper
+
+    return decorator
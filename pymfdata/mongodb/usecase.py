@@ -0,0 +1,88 @@
+from contextvars import ContextVar
+from motor.motor_asyncio import AsyncIOMotorClientSession
+from pymongo import ReadPreference
+from pymongo.errors import PyMongoError
+from pymongo.read_concern import ReadConcern
+from pymongo.write_concern import WriteConcern
+from typing import Any, Dict, Optional, Tuple, Type
+
+from pymfdata.common.usecase import AsyncBaseUnitOfWork
+from pymfdata.mongodb.connection import AsyncMotor
+
+UNKNOWN_TRANSACTION_COMMIT_RESULT = "UnknownTransactionCommitResult"
+
+# sessions are keyed by the client that started them, innermost last
+_sessions: ContextVar[Dict[Any, AsyncIOMotorClientSession]] = ContextVar("pymfdata_motor_session", default={})
+
+
+def current_session(client: Any = None) -> Optional[AsyncIOMotorClientSession]:
+    sessions = _sessions.get()
+    if client is not None:
+        return sessions.get(client)
+    return next(reversed(sessions.values()), None)
+
+
+class MotorUnitOfWork(AsyncBaseUnitOfWork):
+    def __init__(self, motor: AsyncMotor, read_concern: Optional[ReadConcern] = None,
+                 write_concern: Optional[WriteConcern] = None, max_commit_time_ms: Optional[int] = None,
+                 max_commit_attempts: int = 3) -> None:
+        self.motor = motor
+        self._read_concern = read_concern
+        self._write_concern = write_concern
+        self._max_commit_time_ms = max_commit_time_ms
+        self._max_commit_attempts = max_commit_attempts
+        self._tokens: ContextVar[Tuple] = ContextVar("pymfdata_motor_uow_{}".format(id(self)), default=())
+
+    @property
+    def session(self) -> AsyncIOMotorClientSession:
+        session = current_session(self.motor.client)
+        assert session is not None
+        return session
+
+    @property
+    def in_transaction(self) -> bool:
+        session = current_session(self.motor.client)
+        return session is not None and session.in_transaction
+
+    async def __aenter__(self):
+        assert self.motor.client is not None
+        token = None
+        if current_session(self.motor.client) is None:
+            session = await self.motor.client.start_session()
+            token = _sessions.set({**_sessions.get(), self.motor.client: session})
+        self._tokens.set(self._tokens.get() + (token,))
+
+    async def __aexit__(self, exc_type: Optional[Type[Exception]], exc_val: Optional[Exception], traceback):
+        *outer, token = self._tokens.get()
+        self._tokens.set(tuple(outer))
+        if token is None:
+            return
+
+        session = self.session
+        try:
+            await self.rollback()      # failed or uncommitted transactions are aborted
+        finally:
+            await session.end_session()
+            _sessions.reset(token)
+
+    def begin(self) -> None:
+        self.session.start_transaction(read_concern=self._read_concern, write_concern=self._write_concern,
+                                       read_preference=ReadPreference.PRIMARY,
+                                       max_commit_time_ms=self._max_commit_time_ms)
+
+    async def commit(self):
+        if not self.in_transaction:
+            return
+
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                return await self.session.commit_transaction()
+            except PyMongoError as e:
+                if attempt >= self._max_commit_attempts or not e.has_error_label(UNKNOWN_TRANSACTION_COMMIT_RESULT):
+                    raise
+
+    async def rollback(self):
+        if self.in_transaction:
+            await self.session.abort_transaction()
@@ -0,0 +1,204 @@
+import time
+
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from inspect import isawaitable
+from threading import Lock
+from typing import Any, Awaitable, Dict, Iterable, NamedTuple, Optional, Tuple, Union
+
+from sqlalchemy import event
+from sqlalchemy.orm import Mapper, Session, make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.inspection import inspect
+
+_Maybe = Union[Any, Awaitable[Any]]
+
+_PENDING_KEY = "pymfdata_entity_cache_pending"
+_AWAITING_KEY = "pymfdata_entity_cache_awaiting"
+_entity_caches: Dict[type, "EntityCache"] = {}
+
+
+class CacheBackend(ABC):
+    @abstractmethod
+    def get(self, key: str) -> _Maybe:
+        raise NotImplementedError("required get for cache backend")
+
+    @abstractmethod
+    def set(self, key: str, value: dict, ttl: Optional[float] = None) -> _Maybe:
+        raise NotImplementedError("required set for cache backend")
+
+    @abstractmethod
+    def delete(self, key: str) -> _Maybe:
+        raise NotImplementedError("required delete for cache backend")
+
+    @abstractmethod
+    def clear(self) -> _Maybe:
+        raise NotImplementedError("required clear for cache backend")
+
+
+class TTLCacheBackend(CacheBackend):
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None) -> None:
+        self._maxsize = maxsize
+        self._ttl = ttl
+        self._items: "OrderedDict[str, Tuple[Optional[float], dict]]" = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+
+            expires_at, value = item
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._items[key]
+                return None
+
+            self._items.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: dict, ttl: Optional[float] = None) -> None:
+        ttl = ttl if ttl is not None else self._ttl
+        with self._lock:
+            self._items[key] = (time.monotonic() + ttl if ttl is not None else None, value)
+            self._items.move_to_end(key)
+            if len(self._items) > self._maxsize:
+                self._items.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._items.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+
+class InMemoryCacheBackend(CacheBackend):
+    def __init__(self) -> None:
+        self.items: Dict[str, dict] = {}
+
+    def get(self, key: str) -> Optional[dict]:
+        return self.items.get(key)
+
+    def set(self, key: str, value: dict, ttl: Optional[float] = None) -> None:
+        self.items[key] = value
+
+    def delete(self, key: str) -> None:
+        self.items.pop(key, None)
+
+    def clear(self) -> None:
+        self.items.clear()
+
+
+class EntityCacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    invalidations: int
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class EntityCache:
+    def __init__(self, backend: CacheBackend, ttl: Optional[float] = None) -> None:
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def key(model: type, identity: Iterable) -> str:
+        return "{}.{}:{}".format(model.__module__, model.__qualname__, ":".join(map(str, identity)))
+
+    @staticmethod
+    def dump(mapper: Mapper, item) -> Optional[dict]:
+        state = inspect(item)
+        if state.modified or state.expired_attributes:
+            return None
+        return {attr.key: state.dict[attr.key] for attr in mapper.column_attrs if attr.key in state.dict}
+
+    @staticmethod
+    def load(mapper: Mapper, values: dict):
+        item = mapper.class_manager.new_instance()
+        for key, value in values.items():
+            set_committed_value(item, key, value)
+
+        make_transient_to_detached(item)
+        return item
+
+    def record(self, hit: bool) -> None:
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+    def invalidate(self, key: str) -> _Maybe:
+        self.invalidations += 1
+        return self.backend.delete(key)
+
+    def info(self) -> EntityCacheInfo:
+        return EntityCacheInfo(self.hits, self.misses, self.invalidations)
+
+
+def register_entity_cache(model: type, cache: EntityCache) -> None:
+    if not _entity_caches:
+        event.listen(Session, "after_flush", _collect_flushed)
+        event.listen(Session, "after_commit", _invalidate_committed)
+        event.listen(Session, "after_soft_rollback", _discard_pending)
+
+    _entity_caches[model] = cache
+
+
+def invalidate_entity(model: type, identity: Iterable) -> _Maybe:
+    cache = _entity_caches.get(model)
+    if cache is None:
+        return None
+    return cache.invalidate(cache.key(model, identity))
+
+
+def mark_invalidated(session: Session, model: type, identities: Iterable[Iterable]) -> None:
+    if model in _entity_caches:
+        session.info.setdefault(_PENDING_KEY, set()).update((model, tuple(identity)) for identity in identities)
+
+
+def has_pending_write(session: Session, model: type, identity: Iterable) -> bool:
+    return (model, tuple(identity)) in session.info.get(_PENDING_KEY, ())
+
+
+def _collect_flushed(session: Session, flush_context) -> None:
+    pending = session.info.setdefault(_PENDING_KEY, set())
+    for item in (*session.new, *session.dirty, *session.deleted):
+        model = type(item)
+        if model in _entity_caches:
+            pending.add((model, tuple(inspect(model).primary_key_from_instance(item))))
+
+
+def _invalidate_committed(session: Session) -> None:
+    if session.in_nested_transaction():
+        return
+
+    for model, identity in session.info.pop(_PENDING_KEY, ()):
+        result = invalidate_entity(model, identity)
+        if isawaitable(result):     # awaited by the committer through await_invalidations()
+            session.info.setdefault(_AWAITING_KEY, []).append(result)
+
+
+async def await_invalidations(session: Session) -> None:
+    error = None
+    for result in session.info.pop(_AWAITING_KEY, ()):
+        try:
+            await result
+        except Exception as e:
+            error = error or e
+
+    if error is not None:
+        raise error
+
+
+def _discard_pending(session: Session, previous_transaction) -> None:
+    if previous_transaction.parent is None:
+        session.info.pop(_PENDING_KEY, None)
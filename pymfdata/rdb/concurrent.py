@@ -0,0 +1,44 @@
+import asyncio
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, Awaitable, Callable, List, Optional
+
+SessionCall = Callable[[AsyncSession], Awaitable[Any]]
+
+
+async def _run_in_session(create_session: Callable[[], AsyncSession], call: SessionCall):
+    session = create_session()
+    try:
+        return await call(session)
+    finally:
+        await session.close()
+
+
+async def gather(create_session: Callable[[], AsyncSession], *calls: SessionCall,
+                 limit: Optional[int] = None) -> List[Any]:
+    semaphore = asyncio.Semaphore(limit) if limit is not None else None
+
+    async def run(call: SessionCall):
+        if semaphore is None:
+            return await _run_in_session(create_session, call)
+
+        async with semaphore:
+            return await _run_in_session(create_session, call)
+
+    tasks = [asyncio.ensure_future(run(call)) for call in calls]
+    if not tasks:
+        return []
+
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+    finally:
+        pending = [task for task in tasks if not task.done()]
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.wait(pending)
+
+    for task in tasks:
+        if task in done and task.exception() is not None:
+            raise task.exception()
+    return [task.result() for task in tasks]
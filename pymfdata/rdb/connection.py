@@ -1,40 +1,107 @@
-from asyncio import current_task
+from asyncio import current_task, gather
 from contextlib import asynccontextmanager, contextmanager
-from typing import AsyncIterable, Callable, Union, Optional
+from typing import Any, AsyncIterable, Callable, List, Union, Optional
 
 from sqlalchemy.engine import Engine, create_engine
 from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_scoped_session, create_async_engine
 from sqlalchemy.orm import sessionmaker, Session, scoped_session
+from sqlalchemy.pool import QueuePool
 
+from pymfdata.rdb import concurrent
+from pymfdata.rdb.concurrent import SessionCall
+from pymfdata.rdb.instrumentation import QueryInstrumentation
 from pymfdata.rdb.mapper import Base
+from pymfdata.rdb.pool import PoolConfig, PoolMonitor, PoolPreset, PoolStats
+from pymfdata.rdb.routing import AsyncReplicaRouter, LoadBalance, SyncReplicaRouter
+
+
+def _pool_config(pool: Union[PoolConfig, PoolPreset]) -> PoolConfig:
+    return pool.config if isinstance(pool, PoolPreset) else pool
+
+
+def _warm_up_size(pool, n: Optional[int]) -> int:
+    if not isinstance(pool, QueuePool):
+        return 1 if n is None else n
+    return pool.size() if n is None else min(n, pool.size())     # overflow connections are discarded on checkin
 
 
 class AsyncSQLAlchemy:
-    def __init__(self, db_uri: str) -> None:
+    def __init__(self, db_uri: str, read_db_uris: Optional[List[str]] = None,
+                 balance: LoadBalance = LoadBalance.ROUND_ROBIN, max_replica_lag: Optional[float] = None) -> None:
         self._db_uri = db_uri
+        self._read_db_uris = read_db_uris or []
+        self._balance = balance
+        self._max_replica_lag = max_replica_lag
         self._engine: Optional[AsyncEngine] = None
+        self._replicas: Optional[AsyncReplicaRouter] = None
+        self._instrumentation: Optional[QueryInstrumentation] = None
+        self._pool_monitor = PoolMonitor()
         self._session_factory = None
 
     async def create_database(self) -> None:
         async with self._engine.begin() as conn:
             await conn.run_sync(Base.metadata.create_all)
 
-    async def connect(self, **kwargs):
+    async def connect(self, health_check_interval: Optional[float] = None,
+                      pool: Optional[Union[PoolConfig, PoolPreset]] = None, **kwargs):
+        if pool is not None:
+            kwargs = {**_pool_config(pool).engine_kwargs(asyncio=True), **kwargs}
+
         self._engine = create_async_engine(self._db_uri, **kwargs)
+        self._pool_monitor.attach(self._engine)
+
+        if self._read_db_uris:
+            self._replicas = AsyncReplicaRouter([create_async_engine(uri, **kwargs) for uri in self._read_db_uris],
+                                                self._balance, self._max_replica_lag)
+            if health_check_interval is not None:
+                self._replicas.start_health_check(health_check_interval)
+
+        if self._instrumentation is not None:
+            self.instrument(self._instrumentation)
+
+    def instrument(self, instrumentation: Optional[QueryInstrumentation]):
+        if self._instrumentation is not None and self._engine is not None:
+            for engine in self._engines():
+                self._instrumentation.detach(engine)
+
+        self._instrumentation = instrumentation
+        if instrumentation is not None and self._engine is not None:
+            for engine in self._engines():
+                instrumentation.attach(engine)
+
+    def _engines(self) -> List[AsyncEngine]:
+        return [self._engine, *(self._replicas.engines if self._replicas is not None else [])]
+
+    async def warm_up(self, n: Optional[int] = None) -> None:
+        for engine in self._engines():
+            connections = await gather(*(engine.connect().start() for _ in range(_warm_up_size(engine.pool, n))))
+            for conn in connections:
+                await conn.close()
+
+    def pool_stats(self) -> PoolStats:
+        return self._pool_monitor.stats()
 
     async def disconnect(self):
         await self._engine.dispose()
 
+        if self._replicas is not None:
+            await self._replicas.stop_health_check()
+            for engine in self._replicas.engines:
+                await engine.dispose()
+
     def init_session_factory(self, autocommit: bool = False, autoflush: bool = False):
         self._session_factory = async_scoped_session(
             sessionmaker(autocommit=autocommit, autoflush=autoflush, bind=self._engine, class_=AsyncSession),
             scopefunc=current_task)
 
     @asynccontextmanager
-    async def session(self) -> Callable[..., AsyncSession]:
+    async def session(self, read_only: bool = False) -> Callable[..., AsyncSession]:
         assert self._session_factory is not None
 
-        session: AsyncSession = self._session_factory()
+        if read_only and self._replicas is not None:
+            session: AsyncSession = self._session_factory.session_factory(bind=self.reader_engine)
+        else:
+            session: AsyncSession = self._session_factory()
         try:
             yield session
         except Exception:
@@ -43,6 +110,16 @@ class AsyncSQLAlchemy:
         finally:
             await session.close()
 
+    async def gather(self, *calls: SessionCall, limit: Optional[int] = None, read_only: bool = True) -> List[Any]:
+        assert self._session_factory is not None
+
+        def create_session() -> AsyncSession:
+            if read_only and self._replicas is not None:
+                return self._session_factory.session_factory(bind=self.reader_engine)
+            return self._session_factory.session_factory()
+
+        return await concurrent.gather(create_session, *calls, limit=limit)
+
     async def get_db_session(self) -> Callable[..., AsyncSession]:
         assert self._session_factory is not None
 
@@ -60,6 +137,15 @@ class AsyncSQLAlchemy:
         assert self._engine is not None
         return self._engine
 
+    @property
+    def reader_engine(self) -> AsyncEngine:
+        replica = self._replicas.choose() if self._replicas is not None else None
+        return replica if replica is not None else self.engine
+
+    @property
+    def replicas(self) -> Optional[AsyncReplicaRouter]:
+        return self._replicas
+
     @property
     def session_factory(self):
         assert self._session_factory is not None
@@ -67,27 +153,78 @@ class AsyncSQLAlchemy:
 
 
 class SyncSQLAlchemy:
-    def __init__(self, db_uri: str) -> None:
+    def __init__(self, db_uri: str, read_db_uris: Optional[List[str]] = None,
+                 balance: LoadBalance = LoadBalance.ROUND_ROBIN, max_replica_lag: Optional[float] = None) -> None:
         self._db_uri = db_uri
+        self._read_db_uris = read_db_uris or []
+        self._balance = balance
+        self._max_replica_lag = max_replica_lag
         self._engine: Union[Engine, None] = None
+        self._replicas: Optional[SyncReplicaRouter] = None
+        self._instrumentation: Optional[QueryInstrumentation] = None
+        self._pool_monitor = PoolMonitor()
         self._session_factory = None
 
     def create_database(self) -> None:
         Base.metadata.create_all(self._engine)
 
-    def connect(self, **kwargs):
+    def connect(self, health_check_interval: Optional[float] = None,
+                pool: Optional[Union[PoolConfig, PoolPreset]] = None, **kwargs):
+        if pool is not None:
+            kwargs = {**_pool_config(pool).engine_kwargs(), **kwargs}
+
         self._engine = create_engine(self._db_uri, **kwargs)
+        self._pool_monitor.attach(self._engine)
+
+        if self._read_db_uris:
+            self._replicas = SyncReplicaRouter([create_engine(uri, **kwargs) for uri in self._read_db_uris],
+                                               self._balance, self._max_replica_lag)
+            if health_check_interval is not None:
+                self._replicas.start_health_check(health_check_interval)
+
+        if self._instrumentation is not None:
+            self.instrument(self._instrumentation)
+
+    def instrument(self, instrumentation: Optional[QueryInstrumentation]):
+        if self._instrumentation is not None and self._engine is not None:
+            for engine in self._engines():
+                self._instrumentation.detach(engine)
+
+        self._instrumentation = instrumentation
+        if instrumentation is not None and self._engine is not None:
+            for engine in self._engines():
+                instrumentation.attach(engine)
+
+    def _engines(self) -> List[Engine]:
+        return [self._engine, *(self._replicas.engines if self._replicas is not None else [])]
+
+    def warm_up(self, n: Optional[int] = None) -> None:
+        for engine in self._engines():
+            connections = [engine.connect() for _ in range(_warm_up_size(engine.pool, n))]
+            for conn in connections:
+                conn.close()
+
+    def pool_stats(self) -> PoolStats:
+        return self._pool_monitor.stats()
 
     def disconnect(self):
         self._engine.dispose()
 
+        if self._replicas is not None:
+            self._replicas.stop_health_check()
+            for engine in self._replicas.engines:
+                engine.dispose()
+
     def init_session_factory(self, autocommit: bool = False, autoflush: bool = False):
         self._session_factory = scoped_session(sessionmaker(autocommit=autocommit,
                                                             autoflush=autoflush, bind=self._engine))
 
     @contextmanager
-    def session(self) -> Callable[..., Session]:
-        session: Session = self._session_factory()
+    def session(self, read_only: bool = False) -> Callable[..., Session]:
+        if read_only and self._replicas is not None:
+            session: Session = self._session_factory.session_factory(bind=self.reader_engine)
+        else:
+            session: Session = self._session_factory()
         try:
             yield session
         except Exception:
@@ -96,6 +233,20 @@ class SyncSQLAlchemy:
         finally:
             session.close()
 
+    @property
+    def engine(self):
+        assert self._engine is not None
+        return self._engine
+
+    @property
+    def reader_engine(self) -> Engine:
+        replica = self._replicas.choose() if self._replicas is not None else None
+        return replica if replica is not None else self.engine
+
+    @property
+    def replicas(self) -> Optional[SyncReplicaRouter]:
+        return self._replicas
+
     @property
     def session_factory(self):
         assert self._session_factory is not None
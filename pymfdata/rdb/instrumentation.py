@@ -0,0 +1,151 @@
+import logging
+import re
+import sys
+import time
+
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from threading import Lock
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence, Union
+
+import greenlet
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from pymfdata.rdb.repository import BaseAsyncRepository, BaseSyncRepository
+
+logger = logging.getLogger("pymfdata.rdb.slow_query")
+
+_START_KEY = "pymfdata_query_start"
+_MAX_CALLER_DEPTH = 128
+
+_PLACEHOLDER = re.compile(r"%\(\w+\)s|\$\d+|:\w+|\?|%s")
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_VALUES = re.compile(r"\(\?(?:, \?)*\)(?:, \(\?(?:, \?)*\))+")
+_IN_LIST = re.compile(r"IN \(\?(?:, \?)+\)", re.IGNORECASE)
+_SPACES = re.compile(r"\s+")
+
+
+def fingerprint(statement: str) -> str:
+    statement = _LITERAL.sub("?", _PLACEHOLDER.sub("?", statement))
+    statement = _IN_LIST.sub("IN (?)", _VALUES.sub("(...)", _SPACES.sub(" ", statement)))
+    return statement.strip()
+
+
+class QueryEvent(NamedTuple):
+    fingerprint: str
+    statement: str
+    duration: float
+    rows: Optional[int]     # affected rows, None for statements that return rows
+    caller: Optional[str]
+
+
+class MetricsSink(ABC):
+    @abstractmethod
+    def record(self, query: QueryEvent) -> None:
+        raise NotImplementedError("required record for metrics sink")
+
+
+class Histogram(NamedTuple):
+    buckets: Sequence[float]
+    counts: List[int]
+    total: float
+    count: int
+
+
+class HistogramSink(MetricsSink):
+    def __init__(self, buckets: Sequence[float] = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)) -> None:
+        self._buckets = tuple(buckets)
+        self._histograms: Dict[str, Histogram] = {}
+        self._lock = Lock()
+
+    def record(self, query: QueryEvent) -> None:
+        with self._lock:
+            histogram = self._histograms.get(query.fingerprint)
+            if histogram is None:
+                histogram = Histogram(self._buckets, [0] * (len(self._buckets) + 1), 0.0, 0)
+
+            histogram.counts[bisect_left(self._buckets, query.duration)] += 1
+            self._histograms[query.fingerprint] = histogram._replace(total=histogram.total + query.duration,
+                                                                     count=histogram.count + 1)
+
+    def snapshot(self) -> Dict[str, Histogram]:
+        with self._lock:
+            return {key: value._replace(counts=list(value.counts)) for key, value in self._histograms.items()}
+
+
+class QueryInstrumentation:
+    def __init__(self, sink: Optional[MetricsSink] = None, slow_threshold: Optional[float] = None,
+                 track_caller: bool = True) -> None:
+        self.sink = sink
+        self.slow_threshold = slow_threshold
+        self.track_caller = track_caller
+
+    def attach(self, engine: Union[AsyncEngine, Engine]) -> None:
+        engine = engine.sync_engine if isinstance(engine, AsyncEngine) else engine
+        if not event.contains(engine, "before_cursor_execute", self._before_cursor_execute):
+            event.listen(engine, "before_cursor_execute", self._before_cursor_execute)
+            event.listen(engine, "after_cursor_execute", self._after_cursor_execute)
+
+    def detach(self, engine: Union[AsyncEngine, Engine]) -> None:
+        engine = engine.sync_engine if isinstance(engine, AsyncEngine) else engine
+        if event.contains(engine, "before_cursor_execute", self._before_cursor_execute):
+            event.remove(engine, "before_cursor_execute", self._before_cursor_execute)
+            event.remove(engine, "after_cursor_execute", self._after_cursor_execute)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        if context is not None:
+            setattr(context, _START_KEY, time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        started = getattr(context, _START_KEY, None)
+        if started is None:     # attached while the statement was running
+            return
+
+        duration = time.perf_counter() - started
+        # the DB-API rowcount of a SELECT is -1 on most drivers, fetched rows are not known at this point
+        rows = cursor.rowcount if cursor.description is None and cursor.rowcount >= 0 else None
+        query = QueryEvent(fingerprint(statement), statement, duration, rows,
+                           _find_caller() if self.track_caller else None)
+
+        if self.sink is not None:
+            self.sink.record(query)
+        if self.slow_threshold is not None and duration >= self.slow_threshold:
+            if rows is None:
+                logger.warning("Slow query (%.3fs) from %s: %s", duration, query.caller, query.fingerprint)
+            else:
+                logger.warning("Slow query (%.3fs, %d rows) from %s: %s", duration, rows, query.caller,
+                               query.fingerprint)
+
+
+def _iter_frames() -> Iterator:
+    frame, current = sys._getframe(2), greenlet.getcurrent()
+    while True:
+        while frame is not None:
+            yield frame
+            frame = frame.f_back
+
+        current = current.parent
+        if current is None:
+            return
+        frame = current.gr_frame
+
+
+def _find_caller() -> Optional[str]:
+    repository, use_case = None, None
+    for depth, frame in enumerate(_iter_frames()):
+        if depth > _MAX_CALLER_DEPTH or use_case is not None:
+            break
+
+        owner = frame.f_locals.get("self")
+        if owner is None:
+            continue
+
+        mro = type(owner).__mro__
+        if BaseAsyncRepository in mro or BaseSyncRepository in mro:
+            repository = "{}.{}".format(type(owner).__name__, frame.f_code.co_name)
+        elif hasattr(type(owner), "uow"):
+            use_case = "{}.{}".format(type(owner).__name__, frame.f_code.co_name)
+
+    return repository or use_case
@@ -0,0 +1,122 @@
+import enum
+import logging
+import time
+
+from bisect import bisect_left
+from dataclasses import dataclass
+from threading import Lock
+from typing import Any, Dict, NamedTuple, Optional, Sequence, Union
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from pymfdata.rdb.instrumentation import Histogram
+
+logger = logging.getLogger("pymfdata.rdb.pool")
+
+_TIMED_KEY = "_pymfdata_timed"
+
+
+@dataclass(frozen=True)
+class PoolConfig:
+    size: int = 5
+    max_overflow: int = 10
+    recycle: Optional[int] = 1800
+    pre_ping: bool = True
+    lifo: bool = True
+    timeout: float = 30.0
+
+    def engine_kwargs(self, asyncio: bool = False) -> Dict[str, Any]:
+        return {
+            "poolclass": AsyncAdaptedQueuePool if asyncio else QueuePool,
+            "pool_size": self.size,
+            "max_overflow": self.max_overflow,
+            "pool_recycle": self.recycle if self.recycle is not None else -1,
+            "pool_pre_ping": self.pre_ping,
+            "pool_use_lifo": self.lifo,
+            "pool_timeout": self.timeout,
+        }
+
+
+class PoolPreset(enum.Enum):
+    WEB = PoolConfig(size=10, max_overflow=20, recycle=1800)                    # many short requests
+    WORKER = PoolConfig(size=2, max_overflow=2, recycle=3600, lifo=False)       # few long-running jobs
+    SERVERLESS = PoolConfig(size=1, max_overflow=0, recycle=300)               # short-lived processes
+
+    @property
+    def config(self) -> PoolConfig:
+        return self.value
+
+
+class PoolStats(NamedTuple):
+    size: int
+    checked_out: int
+    idle: int
+    overflow: int
+    wait: Histogram
+
+
+class PoolMonitor:
+    def __init__(self, buckets: Sequence[float] = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)) -> None:
+        self._buckets = tuple(buckets)
+        self._engine: Optional[Engine] = None
+        self._checked_out = 0
+        self._counts = [0] * (len(self._buckets) + 1)
+        self._total = 0.0
+        self._count = 0
+        self._lock = Lock()
+
+    def attach(self, engine: Union[AsyncEngine, Engine]) -> None:
+        engine = engine.sync_engine if isinstance(engine, AsyncEngine) else engine
+        self._engine = engine
+
+        event.listen(engine, "checkout", self._on_checkout)
+        event.listen(engine, "checkin", self._on_checkin)
+        self._time_pool(engine.pool)
+        event.listen(engine, "engine_disposed", lambda disposed: self._time_pool(disposed.pool))
+
+    def _time_pool(self, pool) -> None:
+        # best effort: SQLAlchemy has no public event before a checkout starts waiting, so the private
+        # Pool._do_get is wrapped when it exists; without it the wait histogram stays empty
+        do_get = getattr(pool, "_do_get", None)
+        if do_get is None:
+            logger.warning("Checkout wait times are unavailable for %s", type(pool).__name__)
+            return
+        if getattr(do_get, _TIMED_KEY, False):
+            return
+
+        def timed_do_get():
+            started = time.perf_counter()
+            try:
+                return do_get()
+            finally:
+                self._record_wait(time.perf_counter() - started)
+
+        setattr(timed_do_get, _TIMED_KEY, True)
+        pool._do_get = timed_do_get
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy) -> None:
+        with self._lock:
+            self._checked_out += 1
+
+    def _on_checkin(self, dbapi_connection, connection_record) -> None:
+        with self._lock:
+            self._checked_out = max(0, self._checked_out - 1)
+
+    def _record_wait(self, duration: float) -> None:
+        with self._lock:
+            self._counts[bisect_left(self._buckets, duration)] += 1
+            self._total += duration
+            self._count += 1
+
+    def stats(self) -> PoolStats:
+        assert self._engine is not None
+        pool = self._engine.pool
+
+        with self._lock:
+            wait = Histogram(self._buckets, list(self._counts), self._total, self._count)
+            if isinstance(pool, QueuePool):
+                return PoolStats(pool.size(), pool.checkedout(), pool.checkedin(), max(0, pool.overflow()), wait)
+            return PoolStats(0, self._checked_out, 0, 0, wait)
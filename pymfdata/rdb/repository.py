@@ -1,14 +1,445 @@
-from typing import final, get_args, List, Protocol, Optional, TypeVar
+import enum
+
+from dataclasses import fields, is_dataclass
+from datetime import date, datetime, time
+from functools import cached_property, partial
+from inspect import isawaitable
+from itertools import groupby, islice
+from typing import (final, get_args, Any, AsyncIterator, Callable, ClassVar, Dict, Iterator, List, Protocol, Optional,
+                    Sequence, Tuple, Type, TypeVar, Union)
+from sqlalchemy import and_, bindparam, delete, insert, or_, tuple_, update
+from sqlalchemy.engine import Dialect
+from sqlalchemy.exc import NoInspectionAvailable
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy.inspection import inspect
-from sqlalchemy.orm import Session, Query
+from sqlalchemy.orm import joinedload, raiseload, selectinload, subqueryload, Mapper, Session, Query
 from sqlalchemy.sql.selectable import Select
 
+from pymfdata.common.pagination import Page, decode_cursor, encode_cursor
+from pymfdata.rdb.cache import (EntityCache, EntityCacheInfo, has_pending_write, mark_invalidated,
+                                register_entity_cache)
 from pymfdata.rdb.mapper import Base
+from pymfdata.rdb.statement import StatementCache, StatementCacheInfo
 
 _MT = TypeVar("_MT", bound=Base)    # Model Type
 _T = TypeVar("_T")                  # Primary key Type
+_DT = TypeVar("_DT")                # DTO Type
+
+_KeysetKey = Tuple[Any, bool]       # (Column attribute, descending)
+_LoadSpec = Union[str, Tuple[str, "LoadStrategy"], Any]    # relationship path, (path, strategy) or loader option
+_Load = Union[None, str, Sequence[_LoadSpec]]             # default profile, profile name or load specs
+
+# keyword arguments of the filtering methods, a column with one of these names could not be filtered on
+_RESERVED_FILTER_KEYS = frozenset({"after", "batch_size", "dto", "into", "limit", "load", "order_by", "partition",
+                                   "synchronize_session", "values"})
+
+_MAX_BIND_PARAMS = {
+    "mssql": 2100,
+    "mysql": 65535,
+    "oracle": 1000,
+    "postgresql": 32767,
+    "sqlite": 999,
+}
+
+
+class RepositoryMetadata:
+    def __init__(self, model) -> None:
+        self.model = model
+
+    @cached_property
+    def mapper(self) -> Mapper:
+        return inspect(self.model)
+
+    @cached_property
+    def pk_columns(self) -> tuple:
+        return tuple(self.mapper.primary_key)
+
+    @cached_property
+    def pk_keys(self) -> Tuple[str, ...]:
+        return tuple(self.mapper.get_property_by_column(column).key for column in self.pk_columns)
+
+    @cached_property
+    def attributes(self) -> dict:
+        return {prop.key: getattr(self.model, prop.key) for prop in self.mapper.column_attrs}
+
+    def attribute(self, key: str):
+        attribute = self.attributes.get(key)
+        if attribute is None:
+            attribute = getattr(self.model, key)
+        return attribute
+
+    def pk_params(self, pk) -> dict:
+        if len(self.pk_keys) == 1:
+            return {self.pk_keys[0]: pk}
+        if isinstance(pk, dict):
+            return {key: pk[key] for key in self.pk_keys}
+
+        pk = tuple(pk)
+        if len(pk) != len(self.pk_keys):
+            raise ValueError("{} requires {} primary key values, got {}".format(
+                self.model.__name__, len(self.pk_keys), len(pk)))
+        return dict(zip(self.pk_keys, pk))
+
+    def pk_value(self, pk):
+        params = self.pk_params(pk)
+        return params[self.pk_keys[0]] if len(self.pk_keys) == 1 else tuple(params[key] for key in self.pk_keys)
+
+    def identity(self, item):
+        if len(self.pk_keys) == 1:
+            return getattr(item, self.pk_keys[0])
+        return tuple(getattr(item, key) for key in self.pk_keys)
+
+    def pk_in(self, pks: Sequence):
+        if len(self.pk_keys) == 1:
+            return self.attribute(self.pk_keys[0]).in_(pks)
+        return tuple_(*(self.attribute(key) for key in self.pk_keys)).in_(pks)
+
+
+async def _resolve(value):
+    if isawaitable(value):
+        return await value
+    return value
+
+
+def _resolve_metadata(cls) -> Optional[RepositoryMetadata]:
+    for base in cls.__dict__.get("__orig_bases__", ()):
+        args = get_args(base)
+        if args and isinstance(args[0], type):
+            return RepositoryMetadata(args[0])
+    return None
+
+
+def _check_filter_keys(cls, metadata: RepositoryMetadata) -> None:
+    try:
+        clashes = sorted(_RESERVED_FILTER_KEYS.intersection(metadata.attributes))
+    except NoInspectionAvailable:   # mapped imperatively later, nothing to check yet
+        return
+
+    if clashes:
+        raise TypeError("{} cannot filter {} by {}, the names clash with repository keyword arguments".format(
+            cls.__name__, metadata.model.__name__, ", ".join(clashes)))
+
+
+class OnConflict(enum.Enum):
+    NOTHING = "nothing"
+    UPDATE = "update"
+
+
+class LoadStrategy(enum.Enum):
+    SELECTIN = "selectin"
+    JOINED = "joined"
+    SUBQUERY = "subquery"
+    RAISE = "raise"
+
+
+_LOADERS = {
+    LoadStrategy.SELECTIN: selectinload,
+    LoadStrategy.JOINED: joinedload,
+    LoadStrategy.SUBQUERY: subqueryload,
+    LoadStrategy.RAISE: raiseload,
+}
+
+
+def _load_specs(profiles: Dict[str, Sequence[_LoadSpec]], load: _Load) -> tuple:
+    if load is None:
+        return tuple(profiles.get("default", ()))
+    if isinstance(load, str):
+        if load not in profiles:
+            raise ValueError("Unknown loading profile: {}".format(load))
+        return tuple(profiles[load])
+    return tuple(load)
+
+
+def _loader_option(model, spec: _LoadSpec):
+    if isinstance(spec, str):
+        spec = (spec, LoadStrategy.SELECTIN)
+    if not isinstance(spec, tuple):
+        return spec
+
+    path, strategy = spec
+    loader = _LOADERS[strategy]
+    if path == "*":
+        return loader("*")
+
+    option, entity = None, model
+    for name in path.split("."):
+        attribute = getattr(entity, name)
+        option = loader(attribute) if option is None else getattr(option, loader.__name__)(attribute)
+        entity = attribute.property.mapper.class_
+    return option
+
+
+def _cacheable_specs(specs: tuple) -> bool:
+    # loader option objects hash by identity, caching them would only fill the cache with one-off entries
+    return all(isinstance(spec, (str, tuple)) for spec in specs)
+
+
+def _loader_options(cache: StatementCache, model, specs: tuple) -> list:
+    if not _cacheable_specs(specs):
+        return [_loader_option(model, spec) for spec in specs]
+    return cache.get(("options", model, specs), lambda: [_loader_option(model, spec) for spec in specs])
+
+
+def _filter_key(model, kwargs: dict) -> tuple:
+    return model, tuple(sorted((key, value is None) for key, value in kwargs.items()))
+
+
+def _filter_params(kwargs: dict) -> dict:
+    return {"filter_" + key: value for key, value in kwargs.items() if value is not None}
+
+
+def _filter_criteria(metadata: RepositoryMetadata, kwargs: dict) -> list:
+    criteria = []
+    for key, value in kwargs.items():
+        column = metadata.attribute(key)
+        criteria.append(column.is_(None) if value is None else column == bindparam("filter_" + key))
+    return criteria
+
+
+def _value_criteria(metadata: RepositoryMetadata, kwargs: dict) -> list:
+    # literal values, synchronize_session="evaluate" cannot resolve the cached filter_* bind parameters
+    criteria = []
+    for key, value in kwargs.items():
+        column = metadata.attribute(key)
+        criteria.append(column.is_(None) if value is None else column == value)
+    return criteria
+
+
+def _max_bind_params(dialect: Dialect) -> int:
+    return _MAX_BIND_PARAMS.get(dialect.name, 999)
+
+
+def _identity_map_lookup(session: Session, metadata: RepositoryMetadata, pks: Sequence) -> Tuple[dict, list]:
+    found, missing = {}, []
+    for pk in dict.fromkeys(pks):   # normalized by RepositoryMetadata.pk_value
+        item = session.identity_map.get(session.identity_key(metadata.model, pk))
+        if item is not None and not inspect(item).expired_attributes:
+            found[pk] = item
+        else:
+            missing.append(pk)
+
+    return found, missing
+
+
+def _session_entity(session: Session, metadata: RepositoryMetadata, pk):
+    item = session.identity_map.get(session.identity_key(metadata.model, metadata.pk_value(pk)))
+    if item is None:
+        return None
+
+    state = inspect(item)
+    return item if state.modified or not state.expired_attributes else None
+
+
+def _to_row(item) -> dict:
+    if isinstance(item, dict):
+        return item
+
+    state = inspect(item)
+    return {attr.columns[0].key: state.dict[attr.key] for attr in state.mapper.column_attrs if attr.key in state.dict}
+
+
+def _supports_insert_returning(dialect: Dialect) -> bool:
+    return getattr(dialect, "insert_returning", getattr(dialect, "full_returning", False))
+
+
+def _insert_for_dialect(dialect: Dialect, table, on_conflict: Optional[OnConflict],
+                        conflict_columns: Sequence[str], update_columns: Sequence[str]):
+    if on_conflict is None:
+        return insert(table)
+
+    if dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect.name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        raise NotImplementedError("ON CONFLICT is not supported for {} dialect".format(dialect.name))
+
+    stmt = dialect_insert(table)
+    if on_conflict == OnConflict.NOTHING or not update_columns:
+        return stmt.on_conflict_do_nothing(index_elements=conflict_columns)
+    return stmt.on_conflict_do_update(index_elements=conflict_columns,
+                                      set_={column: stmt.excluded[column] for column in update_columns})
+
+
+def _bulk_insert_batches(metadata: RepositoryMetadata, dialect: Dialect, rows: Sequence[Union[dict, Base]],
+                         chunk_size: int, on_conflict: Optional[OnConflict], conflict_columns: Optional[Sequence[str]],
+                         update_columns: Optional[Sequence[str]]):
+    mapper, pk_columns = metadata.mapper, metadata.pk_columns
+    pk_keys = [column.key for column in pk_columns]
+    conflict_columns = list(conflict_columns or pk_keys)
+    returning = _supports_insert_returning(dialect)
+    matched = conflict_columns if on_conflict is not None else []
+    table = mapper.local_table
+
+    for i in range(0, len(rows), chunk_size):
+        # only consecutive rows with the same columns share a statement, so the keys keep the input order
+        for columns, group in groupby(map(_to_row, rows[i:i + chunk_size]), key=lambda row: tuple(sorted(row))):
+            params = list(group)
+            stmt = _insert_for_dialect(dialect, table, on_conflict, conflict_columns,
+                                       update_columns or [c for c in columns if c not in conflict_columns])
+            if returning:
+                step = max(1, _max_bind_params(dialect) // len(columns))
+                for j in range(0, len(params), step):
+                    batch = params[j:j + step]
+                    yield (stmt.values(batch).returning(*pk_columns, *(table.c[c] for c in matched)), None,
+                           partial(_returned_keys, batch=batch, pk_width=len(pk_columns), matched=matched))
+            elif on_conflict is None and all(key in columns for key in pk_keys):
+                yield stmt, params, _executed_keys
+            else:   # executemany reports neither generated keys nor skipped rows, run one statement per row
+                for row in params:
+                    yield stmt, [row], _executed_keys
+
+
+def _key(row) -> Any:
+    return row[0] if len(row) == 1 else tuple(row)
+
+
+def _returned_keys(result, batch: List[dict], pk_width: int, matched: Sequence[str]) -> list:
+    # RETURNING yields only the written rows in VALUES order, rows skipped by ON CONFLICT DO NOTHING get None
+    returned = result.fetchall()
+    keys, position = [], 0
+    for row in batch:
+        current = returned[position] if position < len(returned) else None
+        if current is not None and all(current[pk_width + n] == row[column]
+                                       for n, column in enumerate(matched) if column in row):
+            keys.append(_key(current[:pk_width]))
+            position += 1
+        else:
+            keys.append(None)
+    return keys
+
+
+def _executed_keys(result) -> list:
+    if result.rowcount == 0:
+        return [None]   # the only row was skipped by ON CONFLICT DO NOTHING
+    return [_key(row) for row in result.inserted_primary_key_rows]
+
+
+def _keyset_keys(metadata: RepositoryMetadata, order_by: Optional[Sequence[str]]) -> List[_KeysetKey]:
+    names = list(order_by or [])
+    ordered = {name.lstrip("-") for name in names}
+    names.extend(key for key in metadata.pk_keys if key not in ordered)
+
+    return [(metadata.attribute(name.lstrip("-")), name.startswith("-")) for name in names]
+
+
+def _nullable(column) -> bool:
+    return bool(getattr(column.expression, "nullable", False))
+
+
+def _keyset_order(keys: List[_KeysetKey]) -> list:
+    order = []
+    for column, desc in keys:
+        clause = column.desc() if desc else column.asc()
+        order.append(clause.nulls_last() if _nullable(column) else clause)     # NULLs sort last in both directions
+    return order
+
+
+def _keyset_equals(column, value):
+    return column.is_(None) if value is None else column == value
+
+
+def _keyset_seek(column, desc: bool, value):
+    if value is None:
+        return None     # nothing sorts after NULL, the tie is broken by the following keys
+
+    seek = column < value if desc else column > value
+    return or_(seek, column.is_(None)) if _nullable(column) else seek
+
+
+def _keyset_predicate(keys: List[_KeysetKey], cursor: str):
+    values = decode_cursor(cursor)
+    if len(values) != len(keys):
+        raise ValueError("Page cursor does not match order_by: {}".format(cursor))
+
+    values = [_coerce_cursor_value(column, value) for (column, _), value in zip(keys, values)]
+    clauses = []
+    for i, (column, desc) in enumerate(keys):
+        seek = _keyset_seek(column, desc, values[i])
+        if seek is not None:
+            clauses.append(and_(*[_keyset_equals(c, v) for (c, _), v in zip(keys[:i], values[:i])], seek))
+
+    return or_(*clauses)
+
+
+def _coerce_cursor_value(column, value):
+    if value is None:
+        return None
+
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        return value
+
+    if isinstance(value, python_type):
+        return value
+    if python_type in (date, datetime, time):
+        return python_type.fromisoformat(value)
+    return python_type(value)
+
+
+def _dto_keys(metadata: RepositoryMetadata, dto: type) -> List[str]:
+    if is_dataclass(dto):
+        names = [field.name for field in fields(dto)]
+    else:
+        names = list(getattr(dto, "model_fields", None) or getattr(dto, "__fields__", None) or
+                     getattr(dto, "_fields", ()))
+
+    keys = [name for name in names if name in metadata.attributes]
+    if not keys:
+        raise ValueError("{} has no fields mapped by {}".format(dto.__name__, metadata.model.__name__))
+    return keys
+
+
+def _projection(metadata: RepositoryMetadata, cache: StatementCache, columns: Sequence[Union[str, Any]],
+                kwargs: dict) -> Tuple[Select, List[str]]:
+    def factory():
+        stmt = select(*(metadata.attribute(column) if isinstance(column, str) else column for column in columns))
+        for criterion in _filter_criteria(metadata, kwargs):
+            stmt = stmt.where(criterion)
+        return stmt
+
+    stmt = cache.get(("columns", tuple(columns), _filter_key(metadata.model, kwargs)), factory)
+    return stmt, [column if isinstance(column, str) else column.key for column in columns]
+
+
+def _projector(into: Optional[type], keys: List[str]) -> Callable[[Any], Any]:
+    if into is None:
+        return lambda row: row
+    if into is tuple:
+        return tuple
+    if into is dict:
+        return lambda row: dict(zip(keys, row))
+
+    construct = getattr(into, "model_construct", None) or getattr(into, "construct", None)
+    if construct is not None:   # pydantic models, skip validation of values coming from the database
+        return lambda row: construct(**dict(zip(keys, row)))
+
+    if is_dataclass(into):
+        init = {field.name for field in fields(into) if field.init}
+        if all(key in init for key in keys):
+            return lambda row: into(**dict(zip(keys, row)))
+
+        def make(row):
+            values = dict(zip(keys, row))
+            item = into(**{key: value for key, value in values.items() if key in init})
+            for key, value in values.items():
+                if key not in init:
+                    object.__setattr__(item, key, value)
+            return item
+
+        return make
+
+    return lambda row: into(**dict(zip(keys, row)))
+
+
+def _keyset_page(keys: List[_KeysetKey], items: List[_MT], limit: int) -> Page[_MT]:
+    if len(items) <= limit:
+        return Page(items=list(items))
+
+    items = list(items[:limit])
+    return Page(items=items, next_cursor=encode_cursor([getattr(items[-1], column.key) for column, _ in keys]))
 
 
 class BaseAsyncRepository(Protocol):
@@ -21,43 +452,159 @@ class BaseAsyncRepository(Protocol):
 
 
 class AsyncRepository(BaseAsyncRepository, Protocol[_MT, _T]):
+    _metadata: ClassVar[RepositoryMetadata]
+    _statement_cache: ClassVar[StatementCache]
+    _statement_cache_size: ClassVar[int] = 128
+    _entity_cache: ClassVar[Optional[EntityCache]] = None
+    _load_profiles: ClassVar[Dict[str, Sequence[_LoadSpec]]] = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._statement_cache = StatementCache(cls._statement_cache_size)
+
+        metadata = _resolve_metadata(cls)
+        if metadata is not None:
+            _check_filter_keys(cls, metadata)
+            cls._metadata = metadata
+        if cls._entity_cache is not None:
+            register_entity_cache(cls._metadata.model, cls._entity_cache)
+
+    @classmethod
+    def statement_cache_info(cls) -> StatementCacheInfo:
+        return cls._statement_cache.info()
+
+    @classmethod
+    def entity_cache_info(cls) -> Optional[EntityCacheInfo]:
+        return cls._entity_cache.info() if cls._entity_cache is not None else None
+
     @property
     def _model(self):
-        return get_args(self.__orig_bases__[0])[0]
+        return self._metadata.model
 
     @property
     def _pk_column(self) -> str:
-        return inspect(self._model).primary_key[0].name
+        return self._metadata.pk_keys[0]
 
     async def delete(self, item: _MT):
         await self.session.delete(item)
 
-    async def find_by_pk(self, pk: _T) -> Optional[_MT]:
-        return await self.find_by_col(**{self._pk_column: pk})
+    async def find_by_pk(self, pk: _T, load: _Load = None) -> Optional[_MT]:
+        params = self._metadata.pk_params(pk)
+        if self._entity_cache is None:
+            return await self.find_by_col(load=load, **params)
+
+        item = _session_entity(self.session.sync_session, self._metadata, pk)
+        if item is not None:    # never overwrite the session's own state with cached values
+            return item
+
+        cache, mapper = self._entity_cache, self._metadata.mapper
+        key = cache.key(self._model, params.values())
+        values = await _resolve(cache.backend.get(key))
+        cache.record(values is not None)
+        if values is not None:
+            return await self.session.merge(cache.load(mapper, values), load=False)
+
+        item = await self.find_by_col(load=load, **params)
+        values = cache.dump(mapper, item) if item is not None else None
+        if values is not None and not has_pending_write(self.session.sync_session, self._model, params.values()):
+            await _resolve(cache.backend.set(key, values, cache.ttl))
+        return item
+
+    @final
+    async def find_by_pks(self, pks: Sequence[_T], chunk_size: Optional[int] = None,
+                          load: _Load = None) -> List[Optional[_MT]]:
+        metadata, sync_session = self._metadata, self.session.sync_session
+        pks = [metadata.pk_value(pk) for pk in pks]
+        found, missing = _identity_map_lookup(sync_session, metadata, pks)
+        options = _loader_options(self._statement_cache, self._model, _load_specs(self._load_profiles, load))
+
+        dialect = sync_session.get_bind(self._model).dialect
+        chunk_size = chunk_size or _max_bind_params(dialect) // len(metadata.pk_keys)
+        for i in range(0, len(missing), chunk_size):
+            stmt = select(self._model).where(metadata.pk_in(missing[i:i + chunk_size])).options(*options)
+            result = await self.session.execute(stmt)
+            found.update((metadata.identity(item), item) for item in result.unique().scalars())
+
+        return [found.get(pk) for pk in pks]
 
     @final
-    async def find_by_col(self, **kwargs) -> Optional[_MT]:
-        item = await self.session.execute(self._gen_stmt_for_param(**kwargs))
+    async def find_by_col(self, load: _Load = None, **kwargs) -> Optional[_MT]:
+        item = await self.session.execute(self._gen_stmt_for_param(load, **kwargs), _filter_params(kwargs))
         return item.unique().scalars().one_or_none()
 
     @final
-    def _gen_stmt_for_param(self, **kwargs) -> Select:
-        stmt = select(self._model)
-        if kwargs:
-            for key, value in kwargs.items():
-                stmt = stmt.where(getattr(self._model, key) == value)
-        return stmt
+    def _gen_stmt_for_param(self, load: _Load = None, **kwargs) -> Select:
+        specs = _load_specs(self._load_profiles, load)
+        if not specs:
+            return self._gen_cached_stmt("select", select, **kwargs)
+        if not _cacheable_specs(specs):
+            return self._gen_cached_stmt("select", select, **kwargs).options(
+                *_loader_options(self._statement_cache, self._model, specs))
+
+        return self._statement_cache.get(
+            ("select", specs, _filter_key(self._model, kwargs)),
+            lambda: self._gen_cached_stmt("select", select, **kwargs).options(
+                *_loader_options(self._statement_cache, self._model, specs)))
 
     @final
-    async def find_all(self, **kwargs) -> List[_MT]:
-        stmt = self._gen_stmt_for_param(**kwargs)
-        result = await self.session.execute(stmt)
+    def _gen_cached_stmt(self, kind: str, construct, **kwargs):
+        def factory():
+            stmt = construct(self._model)
+            for criterion in _filter_criteria(self._metadata, kwargs):
+                stmt = stmt.where(criterion)
+            return stmt
+
+        return self._statement_cache.get((kind, _filter_key(self._model, kwargs)), factory)
+
+    @final
+    async def find_all(self, load: _Load = None, **kwargs) -> List[_MT]:
+        stmt = self._gen_stmt_for_param(load, **kwargs)
+        result = await self.session.execute(stmt, _filter_params(kwargs))
 
         return result.unique().scalars().fetchall()
 
+    @final
+    async def select_columns(self, *columns: Union[str, Any], into: Optional[type] = None, **kwargs) -> list:
+        stmt, keys = _projection(self._metadata, self._statement_cache, columns, kwargs)
+        result = await self.session.execute(stmt, _filter_params(kwargs))
+
+        return list(map(_projector(into, keys), result.all()))
+
+    @final
+    async def find_all_as(self, dto: Type[_DT], **kwargs) -> List[_DT]:
+        return await self.select_columns(*_dto_keys(self._metadata, dto), into=dto, **kwargs)
+
+    @final
+    async def stream_all(self, batch_size: int = 1000, partition: bool = False, load: _Load = None,
+                         **kwargs) -> AsyncIterator[Union[_MT, List[_MT]]]:
+        stmt = self._gen_stmt_for_param(load, **kwargs).execution_options(yield_per=batch_size)
+        result = await self.session.stream(stmt, _filter_params(kwargs))
+
+        if partition:
+            async for items in result.scalars().partitions(batch_size):
+                yield items
+        else:
+            async for item in result.scalars():
+                yield item
+
+    @final
+    async def find_page(self, after: Optional[str] = None, limit: int = 20, order_by: Optional[Sequence[str]] = None,
+                        load: _Load = None, **kwargs) -> Page[_MT]:
+        keys = _keyset_keys(self._metadata, order_by)
+
+        stmt = self._gen_stmt_for_param(load, **kwargs)
+        if after is not None:
+            stmt = stmt.where(_keyset_predicate(keys, after))
+        stmt = stmt.order_by(*_keyset_order(keys)).limit(limit + 1)
+
+        result = await self.session.execute(stmt, _filter_params(kwargs))
+        return _keyset_page(keys, result.unique().scalars().fetchall(), limit)
+
     @final
     async def is_exists(self, **kwargs) -> bool:
-        result = await self.session.execute(self._gen_stmt_for_param(**kwargs).exists().select())
+        stmt = self._statement_cache.get(("exists", _filter_key(self._model, kwargs)),
+                                         lambda: self._gen_stmt_for_param((), **kwargs).exists().select())
+        result = await self.session.execute(stmt, _filter_params(kwargs))
         return result.scalar()
 
     @final
@@ -68,11 +615,51 @@ class AsyncRepository(BaseAsyncRepository, Protocol[_MT, _T]):
     async def create_all(self, items: List[_MT]):
         self.session.add_all(items)
 
+    @final
+    async def bulk_insert(self, rows: Sequence[Union[dict, _MT]], chunk_size: int = 1000,
+                          on_conflict: Optional[OnConflict] = None, conflict_columns: Optional[Sequence[str]] = None,
+                          update_columns: Optional[Sequence[str]] = None) -> List[_T]:
+        dialect = self.session.sync_session.get_bind(self._model).dialect
+
+        keys = []
+        for stmt, params, inserted_keys in _bulk_insert_batches(self._metadata, dialect, rows, chunk_size,
+                                                                on_conflict, conflict_columns, update_columns):
+            result = await self.session.execute(stmt, params)
+            keys.extend(inserted_keys(result))
+        return keys
+
+    @final
+    async def bulk_upsert(self, rows: Sequence[Union[dict, _MT]], chunk_size: int = 1000,
+                          conflict_columns: Optional[Sequence[str]] = None,
+                          update_columns: Optional[Sequence[str]] = None) -> List[_T]:
+        return await self.bulk_insert(rows, chunk_size, OnConflict.UPDATE, conflict_columns, update_columns)
+
     def update(self, item: _MT, req: dict):
         for k, v in req.items():
             if v is not None:
                 setattr(item, k, v)
 
+    @final
+    async def _invalidate_where(self, **kwargs):
+        if self._entity_cache is not None:
+            stmt = self._gen_cached_stmt("identity", lambda model: select(*self._metadata.pk_columns), **kwargs)
+            result = await self.session.execute(stmt, _filter_params(kwargs))
+            mark_invalidated(self.session.sync_session, self._model, result.fetchall())
+
+    @final
+    async def update_where(self, values: dict, synchronize_session: Union[str, bool] = "evaluate", **kwargs) -> int:
+        await self._invalidate_where(**kwargs)
+        stmt = update(self._model).where(*_value_criteria(self._metadata, kwargs)).values(**values)
+        result = await self.session.execute(stmt.execution_options(synchronize_session=synchronize_session))
+        return result.rowcount
+
+    @final
+    async def delete_where(self, synchronize_session: Union[str, bool] = "evaluate", **kwargs) -> int:
+        await self._invalidate_where(**kwargs)
+        stmt = delete(self._model).where(*_value_criteria(self._metadata, kwargs))
+        result = await self.session.execute(stmt.execution_options(synchronize_session=synchronize_session))
+        return result.rowcount
+
 
 class BaseSyncRepository(Protocol):
     _session: Session
@@ -84,52 +671,193 @@ class BaseSyncRepository(Protocol):
 
 
 class SyncRepository(BaseSyncRepository, Protocol[_MT, _T]):
+    _metadata: ClassVar[RepositoryMetadata]
+    _statement_cache: ClassVar[StatementCache]
+    _statement_cache_size: ClassVar[int] = 128
+    _entity_cache: ClassVar[Optional[EntityCache]] = None
+    _load_profiles: ClassVar[Dict[str, Sequence[_LoadSpec]]] = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._statement_cache = StatementCache(cls._statement_cache_size)
+
+        metadata = _resolve_metadata(cls)
+        if metadata is not None:
+            _check_filter_keys(cls, metadata)
+            cls._metadata = metadata
+        if cls._entity_cache is not None:
+            register_entity_cache(cls._metadata.model, cls._entity_cache)
+
+    @classmethod
+    def statement_cache_info(cls) -> StatementCacheInfo:
+        return cls._statement_cache.info()
+
+    @classmethod
+    def entity_cache_info(cls) -> Optional[EntityCacheInfo]:
+        return cls._entity_cache.info() if cls._entity_cache is not None else None
 
     @property
     def _model(self):
-        return get_args(self.__orig_bases__[0])[0]
+        return self._metadata.model
 
     @property
     def _pk_column(self) -> str:
-        return inspect(self._model).primary_key[0].name
+        return self._metadata.pk_keys[0]
 
     @final
     def count(self, **kwargs) -> int:
-        return self._gen_query_for_param(**kwargs).count()
+        return self._gen_query_for_param((), **kwargs).count()
 
     def delete(self, item: _MT):
         self.session.delete(item)
 
-    def find_by_pk(self, pk: _T) -> Optional[_MT]:
-        return self.find_by_col(**{self._pk_column: pk})
+    def find_by_pk(self, pk: _T, load: _Load = None) -> Optional[_MT]:
+        params = self._metadata.pk_params(pk)
+        if self._entity_cache is None:
+            return self.find_by_col(load=load, **params)
+
+        item = _session_entity(self.session, self._metadata, pk)
+        if item is not None:    # never overwrite the session's own state with cached values
+            return item
+
+        cache, mapper = self._entity_cache, self._metadata.mapper
+        key = cache.key(self._model, params.values())
+        values = cache.backend.get(key)
+        cache.record(values is not None)
+        if values is not None:
+            return self.session.merge(cache.load(mapper, values), load=False)
+
+        item = self.find_by_col(load=load, **params)
+        values = cache.dump(mapper, item) if item is not None else None
+        if values is not None and not has_pending_write(self.session, self._model, params.values()):
+            cache.backend.set(key, values, cache.ttl)
+        return item
+
+    @final
+    def find_by_pks(self, pks: Sequence[_T], chunk_size: Optional[int] = None,
+                    load: _Load = None) -> List[Optional[_MT]]:
+        metadata = self._metadata
+        pks = [metadata.pk_value(pk) for pk in pks]
+        found, missing = _identity_map_lookup(self.session, metadata, pks)
+        options = _loader_options(self._statement_cache, self._model, _load_specs(self._load_profiles, load))
+
+        dialect = self.session.get_bind(self._model).dialect
+        chunk_size = chunk_size or _max_bind_params(dialect) // len(metadata.pk_keys)
+        for i in range(0, len(missing), chunk_size):
+            query = self.session.query(self._model).options(*options)
+            items = query.filter(metadata.pk_in(missing[i:i + chunk_size])).all()
+            found.update((metadata.identity(item), item) for item in items)
+
+        return [found.get(pk) for pk in pks]
 
     @final
-    def find_by_col(self, **kwargs) -> Optional[_MT]:
-        query = self._gen_query_for_param(**kwargs)
+    def find_by_col(self, load: _Load = None, **kwargs) -> Optional[_MT]:
+        query = self._gen_query_for_param(load, **kwargs)
         return query.one_or_none()
 
     @final
-    def _gen_query_for_param(self, **kwargs) -> Query:
+    def _gen_query_for_param(self, load: _Load = None, **kwargs) -> Query:
         query = self.session.query(self._model)
+        specs = _load_specs(self._load_profiles, load)
+        if specs:
+            query = query.options(*_loader_options(self._statement_cache, self._model, specs))
         if kwargs:
-            for key, value in kwargs.items():
-                query = query.filter(getattr(self._model, key) == value)
+            criterion = self._statement_cache.get(("criteria", _filter_key(self._model, kwargs)),
+                                                  lambda: and_(*_filter_criteria(self._metadata, kwargs)))
+            query = query.filter(criterion).params(_filter_params(kwargs))
         return query
 
     @final
-    def find_all(self, **kwargs) -> List[_MT]:
-        query = self._gen_query_for_param(**kwargs)
+    def find_all(self, load: _Load = None, **kwargs) -> List[_MT]:
+        query = self._gen_query_for_param(load, **kwargs)
         return query.all()
 
+    @final
+    def select_columns(self, *columns: Union[str, Any], into: Optional[type] = None, **kwargs) -> list:
+        stmt, keys = _projection(self._metadata, self._statement_cache, columns, kwargs)
+        result = self.session.execute(stmt, _filter_params(kwargs))
+
+        return list(map(_projector(into, keys), result.all()))
+
+    @final
+    def find_all_as(self, dto: Type[_DT], **kwargs) -> List[_DT]:
+        return self.select_columns(*_dto_keys(self._metadata, dto), into=dto, **kwargs)
+
+    @final
+    def stream_all(self, batch_size: int = 1000, partition: bool = False,
+                   load: _Load = None, **kwargs) -> Iterator[Union[_MT, List[_MT]]]:
+        query = self._gen_query_for_param(load, **kwargs)
+        query = query.execution_options(stream_results=True).yield_per(batch_size)
+
+        if partition:
+            rows = iter(query)
+            while True:
+                items = list(islice(rows, batch_size))
+                if not items:
+                    break
+                yield items
+        else:
+            yield from query
+
+    @final
+    def find_page(self, after: Optional[str] = None, limit: int = 20, order_by: Optional[Sequence[str]] = None,
+                  load: _Load = None, **kwargs) -> Page[_MT]:
+        keys = _keyset_keys(self._metadata, order_by)
+
+        query = self._gen_query_for_param(load, **kwargs)
+        if after is not None:
+            query = query.filter(_keyset_predicate(keys, after))
+        query = query.order_by(*_keyset_order(keys)).limit(limit + 1)
+
+        return _keyset_page(keys, query.all(), limit)
+
     @final
     def is_exists(self, **kwargs) -> bool:
-        return self.session.query(self._gen_query_for_param(**kwargs).exists()).scalar()
+        query = self.session.query(self._gen_query_for_param((), **kwargs).exists())
+        return query.params(_filter_params(kwargs)).scalar()
 
     @final
     def create(self, item: Base):
         self.session.add(item)
 
+    @final
+    def bulk_insert(self, rows: Sequence[Union[dict, _MT]], chunk_size: int = 1000,
+                    on_conflict: Optional[OnConflict] = None, conflict_columns: Optional[Sequence[str]] = None,
+                    update_columns: Optional[Sequence[str]] = None) -> List[_T]:
+        dialect = self.session.get_bind(self._model).dialect
+
+        keys = []
+        for stmt, params, inserted_keys in _bulk_insert_batches(self._metadata, dialect, rows, chunk_size,
+                                                                on_conflict, conflict_columns, update_columns):
+            result = self.session.execute(stmt, params)
+            keys.extend(inserted_keys(result))
+        return keys
+
+    @final
+    def bulk_upsert(self, rows: Sequence[Union[dict, _MT]], chunk_size: int = 1000,
+                    conflict_columns: Optional[Sequence[str]] = None,
+                    update_columns: Optional[Sequence[str]] = None) -> List[_T]:
+        return self.bulk_insert(rows, chunk_size, OnConflict.UPDATE, conflict_columns, update_columns)
+
     def update(self, item: _MT, req: dict):
         for k, v in req.items():
             if v is not None:
                 setattr(item, k, v)
+
+    @final
+    def _invalidate_where(self, **kwargs):
+        if self._entity_cache is not None:
+            rows = self._gen_query_for_param((), **kwargs).with_entities(*self._metadata.pk_columns).all()
+            mark_invalidated(self.session, self._model, rows)
+
+    @final
+    def update_where(self, values: dict, synchronize_session: Union[str, bool] = "evaluate", **kwargs) -> int:
+        self._invalidate_where(**kwargs)
+        query = self.session.query(self._model).filter(*_value_criteria(self._metadata, kwargs))
+        return query.update(values, synchronize_session=synchronize_session)
+
+    @final
+    def delete_where(self, synchronize_session: Union[str, bool] = "evaluate", **kwargs) -> int:
+        self._invalidate_where(**kwargs)
+        query = self.session.query(self._model).filter(*_value_criteria(self._metadata, kwargs))
+        return query.delete(synchronize_session=synchronize_session)
@@ -0,0 +1,79 @@
+import logging
+import random
+
+from sqlalchemy.exc import DBAPIError, OperationalError
+from typing import Callable, Dict, Optional, Tuple, Type, Union
+
+logger = logging.getLogger("pymfdata.rdb.retry")
+
+_RetryOn = Union[Type[BaseException], Tuple[Type[BaseException], ...], Callable[[BaseException], bool]]
+
+_POSTGRESQL_STATES = {"40001", "40P01"}    # serialization_failure, deadlock_detected
+_MYSQL_ERRORS = {1205, 1213}                # lock wait timeout, deadlock
+
+
+def _postgresql_retryable(error: DBAPIError) -> bool:
+    state = getattr(error.orig, "pgcode", None) or getattr(error.orig, "sqlstate", None)
+    return state in _POSTGRESQL_STATES
+
+
+def _mysql_retryable(error: DBAPIError) -> bool:
+    args = getattr(error.orig, "args", ())
+    return bool(args) and args[0] in _MYSQL_ERRORS
+
+
+def _sqlite_retryable(error: DBAPIError) -> bool:
+    return isinstance(error, OperationalError) and "database is locked" in str(error.orig)
+
+
+_RETRYABLE: Dict[str, Callable[[DBAPIError], bool]] = {
+    "postgresql": _postgresql_retryable,
+    "mysql": _mysql_retryable,
+    "mariadb": _mysql_retryable,
+    "sqlite": _sqlite_retryable,
+}
+
+
+def is_retryable_error(error: BaseException, dialect: str) -> bool:
+    if not isinstance(error, DBAPIError):
+        return False
+    if error.connection_invalidated:
+        return True
+
+    if not dialect:     # unknown, e.g. a session factory with several binds
+        return any(classify(error) for classify in _RETRYABLE.values())
+
+    classify = _RETRYABLE.get(dialect)
+    return classify is not None and classify(error)
+
+
+class RetryPolicy:
+    def __init__(self, max_attempts: int = 3, backoff: float = 0.05, jitter: float = 0.5,
+                 max_backoff: float = 2.0, retry_on: Optional[_RetryOn] = None) -> None:
+        assert max_attempts >= 1
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.jitter = jitter
+        self.max_backoff = max_backoff
+        self.retry_on = retry_on
+        self.attempts = 0
+        self.retries = 0
+
+    def is_retryable(self, error: BaseException, dialect: str) -> bool:
+        if self.retry_on is None:
+            return is_retryable_error(error, dialect)
+        if isinstance(self.retry_on, (type, tuple)):
+            return isinstance(error, self.retry_on)
+        return self.retry_on(error)
+
+    def should_retry(self, attempt: int, error: BaseException, dialect: str) -> bool:
+        if attempt >= self.max_attempts or not self.is_retryable(error, dialect):
+            return False
+
+        self.retries += 1
+        logger.warning("Retrying transaction (attempt %d of %d) after %r", attempt + 1, self.max_attempts, error)
+        return True
+
+    def delay(self, attempt: int) -> float:
+        delay = min(self.max_backoff, self.backoff * 2 ** (attempt - 1))
+        return delay + random.uniform(0, delay * self.jitter)
@@ -0,0 +1,159 @@
+import asyncio
+import enum
+import threading
+import time
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from itertools import count
+from typing import Dict, Generic, Iterator, List, Optional, TypeVar
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+_ET = TypeVar("_ET", AsyncEngine, Engine)     # Engine Type
+
+_read_only: ContextVar[bool] = ContextVar("pymfdata_read_only", default=False)
+
+_PING = text("SELECT 1")
+_REPLICATION_LAG = {
+    "postgresql": text("SELECT COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)"),
+}
+
+
+class LoadBalance(enum.Enum):
+    ROUND_ROBIN = "round_robin"
+    LEAST_LATENCY = "least_latency"
+
+
+@contextmanager
+def use_replica(read_only: bool = True) -> Iterator[None]:
+    token = _read_only.set(read_only)
+    try:
+        yield
+    finally:
+        _read_only.reset(token)
+
+
+def is_read_only() -> bool:
+    return _read_only.get()
+
+
+class ReplicaRouter(Generic[_ET]):
+    def __init__(self, engines: List[_ET], balance: LoadBalance = LoadBalance.ROUND_ROBIN,
+                 max_lag: Optional[float] = None) -> None:
+        self._engines = engines
+        self._balance = balance
+        self._max_lag = max_lag
+        self._counter = count()
+        self._latencies: Dict[int, float] = {}
+        self._ejected: set = set()
+
+    @property
+    def engines(self) -> List[_ET]:
+        return self._engines
+
+    @property
+    def healthy_engines(self) -> List[_ET]:
+        return [engine for i, engine in enumerate(self._engines) if i not in self._ejected]
+
+    def choose(self) -> Optional[_ET]:
+        candidates = [i for i in range(len(self._engines)) if i not in self._ejected]
+        if not candidates:
+            return None
+
+        if self._balance == LoadBalance.LEAST_LATENCY:
+            index = min(candidates, key=lambda i: self._latencies.get(i, 0.0))
+        else:
+            index = candidates[next(self._counter) % len(candidates)]
+        return self._engines[index]
+
+    def _record(self, index: int, latency: Optional[float], lag: Optional[float]) -> None:
+        if latency is None or (self._max_lag is not None and lag is not None and lag > self._max_lag):
+            self._ejected.add(index)
+            return
+
+        previous = self._latencies.get(index)
+        self._latencies[index] = latency if previous is None else previous * 0.8 + latency * 0.2
+        self._ejected.discard(index)
+
+
+class AsyncReplicaRouter(ReplicaRouter[AsyncEngine]):
+    def __init__(self, engines: List[AsyncEngine], balance: LoadBalance = LoadBalance.ROUND_ROBIN,
+                 max_lag: Optional[float] = None) -> None:
+        super().__init__(engines, balance, max_lag)
+        self._health_check_task: Optional[asyncio.Task] = None
+
+    async def check_health(self) -> None:
+        for index, engine in enumerate(self._engines):
+            latency, lag = None, None
+            try:
+                async with engine.connect() as conn:
+                    started = time.perf_counter()
+                    await conn.execute(_PING)
+                    latency = time.perf_counter() - started
+
+                    lag_query = _REPLICATION_LAG.get(engine.dialect.name)
+                    if self._max_lag is not None and lag_query is not None:
+                        lag = float((await conn.execute(lag_query)).scalar() or 0)
+            except Exception:
+                latency = None
+
+            self._record(index, latency, lag)
+
+    def start_health_check(self, interval: float) -> None:
+        async def run():
+            while True:
+                await self.check_health()
+                await asyncio.sleep(interval)
+
+        self._health_check_task = asyncio.create_task(run())
+
+    async def stop_health_check(self) -> None:
+        if self._health_check_task is not None:
+            self._health_check_task.cancel()
+            try:
+                await self._health_check_task
+            except asyncio.CancelledError:
+                pass
+            self._health_check_task = None
+
+
+class SyncReplicaRouter(ReplicaRouter[Engine]):
+    def __init__(self, engines: List[Engine], balance: LoadBalance = LoadBalance.ROUND_ROBIN,
+                 max_lag: Optional[float] = None) -> None:
+        super().__init__(engines, balance, max_lag)
+        self._health_check_stop: Optional[threading.Event] = None
+
+    def check_health(self) -> None:
+        for index, engine in enumerate(self._engines):
+            latency, lag = None, None
+            try:
+                with engine.connect() as conn:
+                    started = time.perf_counter()
+                    conn.execute(_PING)
+                    latency = time.perf_counter() - started
+
+                    lag_query = _REPLICATION_LAG.get(engine.dialect.name)
+                    if self._max_lag is not None and lag_query is not None:
+                        lag = float(conn.execute(lag_query).scalar() or 0)
+            except Exception:
+                latency = None
+
+            self._record(index, latency, lag)
+
+    def start_health_check(self, interval: float) -> None:
+        stop = self._health_check_stop = threading.Event()
+
+        def run():
+            while not stop.is_set():
+                self.check_health()
+                stop.wait(interval)
+
+        threading.Thread(target=run, name="pymfdata-replica-health-check", daemon=True).start()
+
+    def stop_health_check(self) -> None:
+        if self._health_check_stop is not None:
+            self._health_check_stop.set()
+            self._health_check_stop = None
@@ -0,0 +1,46 @@
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Callable, Hashable, NamedTuple
+
+
+class StatementCacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    maxsize: int
+    currsize: int
+
+
+class StatementCache:
+    def __init__(self, maxsize: int = 128) -> None:
+        self._maxsize = maxsize
+        self._statements: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        with self._lock:
+            stmt = self._statements.get(key)
+            if stmt is not None:
+                self._statements.move_to_end(key)
+                self.hits += 1
+                return stmt
+
+            self.misses += 1
+
+        stmt = factory()
+        with self._lock:
+            self._statements[key] = stmt
+            if len(self._statements) > self._maxsize:
+                self._statements.popitem(last=False)
+
+        return stmt
+
+    def clear(self) -> None:
+        with self._lock:
+            self._statements.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def info(self) -> StatementCacheInfo:
+        return StatementCacheInfo(self.hits, self.misses, self._maxsize, len(self._statements))
@@ -1,121 +1,330 @@
+import asyncio
 import enum
-
-from pymfdata.rdb.usecase import AsyncSession, Session
-from sqlalchemy import inspect
+import time
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pymfdata.rdb.cache import await_invalidations
+from pymfdata.rdb.retry import RetryPolicy
+from pymfdata.rdb.routing import use_replica
+from pymfdata.rdb.usecase import async_begin, join_session, sync_begin
+from sqlalchemy import inspect, select, tuple_
 from sqlalchemy.exc import NoInspectionAvailable
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only, Session
+from sqlalchemy.orm.state import InstanceState
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Sequence, Union
+
+# ambient transactions by transaction key (engine or session factory), innermost last
+_ambient: ContextVar[Dict[Any, Union[AsyncSession, Session]]] = ContextVar("pymfdata_ambient_transaction",
+                                                                           default={})
 
 
 class Propagation(enum.Enum):
-    REQUIRED = "required"
-    REQUIRES_NEW = "requires_new"
+    REQUIRED = "required"           # join the ambient transaction, or start one
+    REQUIRES_NEW = "requires_new"   # always start a transaction in a new session
+    NESTED = "nested"               # SAVEPOINT inside the ambient transaction, or start one
+    SUPPORTS = "supports"           # join the ambient transaction, or run without one
+    MANDATORY = "mandatory"         # join the ambient transaction, raise without one
+    NEVER = "never"                 # run without a transaction, raise inside one
+
+
+class IllegalTransactionStateError(Exception):
+    pass
+
+
+def current_session(key: Any = None) -> Optional[Union[AsyncSession, Session]]:
+    ambient = _ambient.get()
+    if key is not None:
+        return ambient.get(key)
+    return next(reversed(ambient.values()), None)
+
+
+def _session_key(session: Union[AsyncSession, Session]) -> Any:
+    return session.bind if session.bind is not None else session
+
+
+@contextmanager
+def _enter_ambient(key: Any, session: Optional[Union[AsyncSession, Session]]) -> Iterator[None]:
+    ambient = {k: v for k, v in _ambient.get().items() if k is not key}
+    if session is not None:
+        ambient[key] = session
+
+    token = _ambient.set(ambient)
+    try:
+        yield
+    finally:
+        _ambient.reset(token)
+
 
+def _joins(propagation: Propagation, ambient: Optional[Union[AsyncSession, Session]]) -> bool:
+    if ambient is None:
+        if propagation == Propagation.MANDATORY:
+            raise IllegalTransactionStateError("Propagation.MANDATORY requires an existing transaction")
+        return False
 
-async def __async_propagation_required(self, func, read_only: bool, session: AsyncSession, args, kwargs):
-    if not session.is_active:
-        session.begin(subtransactions=True)
+    if propagation == Propagation.NEVER:
+        raise IllegalTransactionStateError("Propagation.NEVER cannot run inside an existing transaction")
+    return propagation != Propagation.REQUIRES_NEW
 
-    result = await func(self, *args, **kwargs)
-    if not read_only:
-        await session.commit()
+
+def _check_session_propagation(propagation: Propagation, ambient: Optional[Union[AsyncSession, Session]],
+                               session: Union[AsyncSession, Session]) -> None:
+    # without a unit of work there is no way to open another session for the new transaction
+    if ambient is session and propagation == Propagation.REQUIRES_NEW:
+        raise IllegalTransactionStateError("Propagation.REQUIRES_NEW inside a transaction requires a unit of work")
+
+
+def _dialect_name(bind) -> str:
+    dialect = getattr(bind, "dialect", None)     # "" for multi-bind session factories
+    return dialect.name if dialect is not None else ""
+
+
+class _Isolation(NamedTuple):
+    level: Optional[str]
+    deferrable: bool
+
+
+class RefreshPolicy(enum.Enum):
+    FULL = "full"       # SELECT the result again after commit
+    EAGER = "eager"     # keep what the flush populated (RETURNING primary keys, eager_defaults) without expiring
+    NONE = "none"       # commit only, the result stays expired
+
+
+def _refresh_targets(result) -> Dict[type, list]:
+    targets = {}
+    for item in result if isinstance(result, (list, tuple, set)) else [result]:
         try:
-            inspect(result)
-            await session.refresh(result)
+            state = inspect(item)
         except NoInspectionAvailable:
-            pass
+            continue
 
-    return result
+        if isinstance(state, InstanceState) and state.key is not None:
+            targets.setdefault(type(item), []).append(item)
+    return targets
 
 
-def __sync_propagation_required(self, func, read_only: bool, session: Session, args, kwargs):
-    if not session.is_active:
-        session.begin(subtransactions=True)
+def _refresh_stmt(model: type, items: list, attributes: Optional[Sequence[str]]):
+    mapper = inspect(model)
+    identities = [inspect(item).identity for item in items]
 
-    result = func(self, *args, **kwargs)
-    if not read_only:
-        session.commit()
+    if len(mapper.primary_key) == 1:
+        criterion = mapper.primary_key[0].in_([identity[0] for identity in identities])
+    else:
+        criterion = tuple_(*mapper.primary_key).in_(identities)
 
-    return result
+    stmt = select(model).where(criterion).execution_options(populate_existing=True)
+    if attributes:
+        stmt = stmt.options(load_only(*attributes))
+    return stmt
 
 
-async def __async_requires_new(self, func, read_only: bool, session: AsyncSession, args, kwargs):
-    if not session.is_active:
-        session.begin()
+async def __async_commit(session: AsyncSession, result, refresh: RefreshPolicy,
+                         refresh_attributes: Optional[List[str]]):
+    if refresh == RefreshPolicy.EAGER:
+        await session.flush()
 
-    result = await func(self, *args, **kwargs)
-    if not read_only:
-        await session.commit()
+        sync_session = session.sync_session
+        expire_on_commit, sync_session.expire_on_commit = sync_session.expire_on_commit, False
         try:
-            inspect(result)
-            await session.refresh(result)
-        except NoInspectionAvailable:
-            pass
+            await session.commit()
+        finally:
+            sync_session.expire_on_commit = expire_on_commit
+        await await_invalidations(sync_session)
+        return
+
+    await session.commit()
+    await await_invalidations(session.sync_session)
+    if refresh == RefreshPolicy.FULL:
+        for model, items in _refresh_targets(result).items():
+            if len(items) == 1:
+                await session.refresh(items[0], refresh_attributes)
+            else:
+                (await session.execute(_refresh_stmt(model, items, refresh_attributes))).scalars().all()
+
+
+def __sync_commit(session: Session, result, refresh: RefreshPolicy, refresh_attributes: Optional[List[str]]):
+    if refresh == RefreshPolicy.EAGER:
+        session.flush()
+
+        expire_on_commit, session.expire_on_commit = session.expire_on_commit, False
+        try:
+            session.commit()
+        finally:
+            session.expire_on_commit = expire_on_commit
+        return
+
+    session.commit()
+    if refresh == RefreshPolicy.FULL:
+        for model, items in _refresh_targets(result).items():
+            if len(items) == 1:
+                session.refresh(items[0], refresh_attributes)
+            else:
+                session.execute(_refresh_stmt(model, items, refresh_attributes)).scalars().all()  # rows load on fetch
 
-    return result
 
+async def __async_begin(self, func, propagation: Propagation, read_only: bool, isolation: _Isolation,
+                        refresh: RefreshPolicy, refresh_attributes: Optional[List[str]], key: Any,
+                        session: AsyncSession, args, kwargs):
+    transactional = propagation not in (Propagation.SUPPORTS, Propagation.NEVER)
+    with _enter_ambient(key, session if transactional else None):
+        if transactional and (read_only or any(isolation)):
+            await async_begin(session, isolation.level, read_only, isolation.deferrable)
 
-def __sync_requires_new(self, func, read_only: bool, session: Session, args, kwargs):
-    if not session.is_active:
-        session.begin()
+        result = await func(self, *args, **kwargs)
+        if transactional and not read_only:
+            await __async_commit(session, result, refresh, refresh_attributes)
 
-    result = func(self, *args, **kwargs)
-    if not read_only:
-        session.commit()
+        return result
 
-    return result
 
+def __sync_begin(self, func, propagation: Propagation, read_only: bool, isolation: _Isolation,
+                 refresh: RefreshPolicy, refresh_attributes: Optional[List[str]], key: Any, session: Session,
+                 args, kwargs):
+    transactional = propagation not in (Propagation.SUPPORTS, Propagation.NEVER)
+    with _enter_ambient(key, session if transactional else None):
+        if transactional and (read_only or any(isolation)):
+            sync_begin(session, isolation.level, read_only, isolation.deferrable)
+
+        result = func(self, *args, **kwargs)
+        if transactional and not read_only:
+            __sync_commit(session, result, refresh, refresh_attributes)
+
+        return result
+
+
+async def __async_retry(retry: Optional[RetryPolicy], key: Any, run):
+    attempt = 0
+    while True:
+        attempt += 1
+        if retry is not None:
+            retry.attempts += 1
+
+        try:
+            return await run()
+        except Exception as e:
+            if retry is None or not retry.should_retry(attempt, e, _dialect_name(key)):
+                raise
+
+        await asyncio.sleep(retry.delay(attempt))
+
+
+def __sync_retry(retry: Optional[RetryPolicy], key: Any, run):
+    attempt = 0
+    while True:
+        attempt += 1
+        if retry is not None:
+            retry.attempts += 1
+
+        try:
+            return run()
+        except Exception as e:
+            if retry is None or not retry.should_retry(attempt, e, _dialect_name(key)):
+                raise
+
+        time.sleep(retry.delay(attempt))
+
+
+async def __async_join(self, func, propagation: Propagation, session: AsyncSession, args, kwargs):
+    if propagation == Propagation.NESTED:
+        async with session.begin_nested():
+            return await func(self, *args, **kwargs)
+
+    return await func(self, *args, **kwargs)
+
+
+def __sync_join(self, func, propagation: Propagation, session: Session, args, kwargs):
+    if propagation == Propagation.NESTED:
+        with session.begin_nested():
+            return func(self, *args, **kwargs)
+
+    return func(self, *args, **kwargs)
+
+
+def async_transactional(read_only: bool = False, propagation: Propagation = Propagation.REQUIRED,
+                        refresh: RefreshPolicy = RefreshPolicy.FULL, refresh_attributes: Optional[List[str]] = None,
+                        retry: Optional[RetryPolicy] = None, isolation_level: Optional[str] = None,
+                        deferrable: bool = False):
+    isolation = _Isolation(isolation_level, deferrable)
 
-def async_transactional(read_only: bool = False, propagation: Propagation = Propagation.REQUIRES_NEW):
     def decorator(func):
         async def wrapper(self, *args, **kwargs):
             if hasattr(self, 'uow'):
-                async with self.uow:
-                    if propagation == Propagation.REQUIRED:
-                        result = await __async_propagation_required(self=self, func=func, read_only=read_only,
-                                                                    session=self.uow.session, args=args, kwargs=kwargs)
-                    else:
-                        result = await __async_requires_new(self=self, func=func, read_only=read_only,
-                                                            session=self.uow.session, args=args, kwargs=kwargs)
+                key = self.uow.transaction_key
+                ambient = current_session(key)
+                if _joins(propagation, ambient):
+                    with join_session(ambient, key):
+                        async with self.uow:
+                            return await __async_join(self, func, propagation, self.uow.session, args, kwargs)
 
-                    return result
+                async def run_in_uow():
+                    with use_replica(read_only), join_session(None):
+                        async with self.uow:
+                            return await __async_begin(self, func, propagation, read_only, isolation, refresh,
+                                                       refresh_attributes, key, self.uow.session, args, kwargs)
 
-            elif hasattr(self, 'session'):
-                if propagation == Propagation.REQUIRED:
-                    result = await __async_propagation_required(self=self, func=func, read_only=read_only,
-                                                                session=self.session, args=args, kwargs=kwargs)
-                else:
-                    result = await __async_requires_new(self=self, func=func, read_only=read_only,
-                                                        session=self.session, args=args, kwargs=kwargs)
+                return await __async_retry(retry, key, run_in_uow)
 
-                return result
+            elif hasattr(self, 'session'):
+                key = _session_key(self.session)
+                ambient = current_session(key)
+                _check_session_propagation(propagation, ambient, self.session)
+                if _joins(propagation, ambient) and ambient is self.session:
+                    return await __async_join(self, func, propagation, self.session, args, kwargs)
+
+                async def run_in_session():
+                    try:
+                        return await __async_begin(self, func, propagation, read_only, isolation, refresh,
+                                                   refresh_attributes, key, self.session, args, kwargs)
+                    except Exception:
+                        await self.session.rollback()
+                        raise
+
+                return await __async_retry(retry, key, run_in_session)
 
         return wrapper
 
     return decorator
 
 
-def sync_transactional(read_only: bool = False, propagation: Propagation = Propagation.REQUIRES_NEW):
+def sync_transactional(read_only: bool = False, propagation: Propagation = Propagation.REQUIRED,
+                       refresh: RefreshPolicy = RefreshPolicy.NONE, refresh_attributes: Optional[List[str]] = None,
+                       retry: Optional[RetryPolicy] = None, isolation_level: Optional[str] = None,
+                       deferrable: bool = False):
+    isolation = _Isolation(isolation_level, deferrable)
+
     def decorator(func):
         def wrapper(self, *args, **kwargs):
             if hasattr(self, 'uow'):
-                with self.uow:
-                    if propagation == Propagation.REQUIRED:
-                        result = __sync_propagation_required(self=self, func=func, read_only=read_only,
-                                                             session=self.uow.session, args=args, kwargs=kwargs)
-                    else:
-                        result = __sync_requires_new(self=self, func=func, read_only=read_only,
-                                                     session=self.uow.session, args=args, kwargs=kwargs)
+                key = self.uow.transaction_key
+                ambient = current_session(key)
+                if _joins(propagation, ambient):
+                    with join_session(ambient, key), self.uow:
+                        return __sync_join(self, func, propagation, self.uow.session, args, kwargs)
+
+                def run_in_uow():
+                    with use_replica(read_only), join_session(None), self.uow:
+                        return __sync_begin(self, func, propagation, read_only, isolation, refresh,
+                                            refresh_attributes, key, self.uow.session, args, kwargs)
 
-                    return result
+                return __sync_retry(retry, key, run_in_uow)
 
             elif hasattr(self, 'session'):
-                if propagation == Propagation.REQUIRED:
-                    result = __sync_propagation_required(self=self, func=func, read_only=read_only,
-                                                         session=self.session, args=args, kwargs=kwargs)
-                else:
-                    result = __sync_requires_new(self=self, func=func, read_only=read_only,
-                                                 session=self.session, args=args, kwargs=kwargs)
-
-                return result
+                key = _session_key(self.session)
+                ambient = current_session(key)
+                _check_session_propagation(propagation, ambient, self.session)
+                if _joins(propagation, ambient) and ambient is self.session:
+                    return __sync_join(self, func, propagation, self.session, args, kwargs)
+
+                def run_in_session():
+                    try:
+                        return __sync_begin(self, func, propagation, read_only, isolation, refresh,
+                                            refresh_attributes, key, self.session, args, kwargs)
+                    except Exception:
+                        self.session.rollback()
+                        raise
+
+                return __sync_retry(retry, key, run_in_session)
 
         return wrapper
 
@@ -1,35 +1,165 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from sqlalchemy import text
 from sqlalchemy.engine import Engine
 from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
-from sqlalchemy.orm import Session
-from typing import Optional, Type
+from sqlalchemy.orm import Session, sessionmaker
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Type, Union
 
 from pymfdata.common.usecase import AsyncBaseUnitOfWork, SyncBaseUnitOfWork
-
-
-class AsyncSQLAlchemyUnitOfWork(AsyncBaseUnitOfWork):
-    def __init__(self, engine: AsyncEngine) -> None:
-        self._engine = engine
-        self._session: Optional[AsyncSession] = None
+from pymfdata.rdb import concurrent
+from pymfdata.rdb.cache import await_invalidations
+from pymfdata.rdb.concurrent import SessionCall
+from pymfdata.rdb.routing import AsyncReplicaRouter, SyncReplicaRouter, is_read_only
+
+_joined_session: ContextVar[Optional[Tuple[Any, Union[AsyncSession, Session]]]] = ContextVar(
+    "pymfdata_joined_session", default=None)
+
+_SET_READ_ONLY = {
+    "mysql": text("SET TRANSACTION READ ONLY"),
+    "mariadb": text("SET TRANSACTION READ ONLY"),
+}
+
+
+@contextmanager
+def join_session(session: Optional[Union[AsyncSession, Session]], key: Any = None) -> Iterator[None]:
+    token = _joined_session.set((key, session) if session is not None else None)
+    try:
+        yield
+    finally:
+        _joined_session.reset(token)
+
+
+def transaction_options(dialect: str, isolation_level: Optional[str] = None, read_only: bool = False,
+                        deferrable: bool = False) -> Dict[str, object]:
+    options: Dict[str, object] = {}
+    if isolation_level is not None:
+        options["isolation_level"] = isolation_level
+
+    if dialect == "postgresql":
+        if read_only:
+            options["postgresql_readonly"] = True
+        if deferrable:
+            options["postgresql_deferrable"] = True
+    return options
+
+
+async def async_begin(session: AsyncSession, isolation_level: Optional[str] = None, read_only: bool = False,
+                      deferrable: bool = False) -> None:
+    dialect = session.get_bind().dialect.name
+    options = transaction_options(dialect, isolation_level, read_only, deferrable)
+    if options:
+        await session.connection(execution_options=options)
+    if read_only and dialect in _SET_READ_ONLY:
+        await session.execute(_SET_READ_ONLY[dialect])
+
+
+def sync_begin(session: Session, isolation_level: Optional[str] = None, read_only: bool = False,
+               deferrable: bool = False) -> None:
+    dialect = session.get_bind().dialect.name
+    options = transaction_options(dialect, isolation_level, read_only, deferrable)
+    if options:
+        session.connection(execution_options=options)
+    if read_only and dialect in _SET_READ_ONLY:
+        session.execute(_SET_READ_ONLY[dialect])
+
+
+def _unwrap_session_factory(session_factory) -> Optional[sessionmaker]:
+    return getattr(session_factory, "session_factory", session_factory)
+
+
+def _joined_for(key: Any) -> Optional[Union[AsyncSession, Session]]:
+    joined = _joined_session.get()
+    return joined[1] if joined is not None and joined[0] is key else None
+
+
+class _UnitOfWorkState:
+    __slots__ = ("session", "owns_session", "outer", "active")
+
+    def __init__(self, session, owns_session: bool, outer: Optional["_UnitOfWorkState"]) -> None:
+        self.session = session
+        self.owns_session = owns_session
+        self.outer = outer
+        self.active = True      # cleared on exit, tasks spawned inside inherit the contextvar value
+
+
+class _TaskLocalState:
+    # only the session of an entered unit of work lives in a contextvar, so tasks sharing it don't collide
+    def __init__(self) -> None:
+        self._task_state: ContextVar[Optional[_UnitOfWorkState]] = ContextVar(
+            "pymfdata_uow_{}".format(id(self)), default=None)
+
+    def _push_state(self, session, owns_session: bool) -> None:
+        outer = self._task_state.get()
+        outer = outer if outer is not None and outer.active else None
+        self._task_state.set(_UnitOfWorkState(session, owns_session, outer))
+
+    def _pop_state(self) -> None:
+        state = self._state()
+        if state.outer is not None:
+            self._task_state.set(state.outer)
+        else:
+            state.active = False
+
+    def _state(self) -> _UnitOfWorkState:
+        state = self._task_state.get()
+        assert state is not None, "the unit of work is not entered"     # the last session stays readable on exit
+        return state
+
+
+class AsyncSQLAlchemyUnitOfWork(_TaskLocalState, AsyncBaseUnitOfWork):
+    def __init__(self, engine: Optional[AsyncEngine] = None, replicas: Optional[AsyncReplicaRouter] = None,
+                 session_factory: Optional[sessionmaker] = None) -> None:
+        super().__init__()
+        assert engine is not None or session_factory is not None
+        self._session_factory = (_unwrap_session_factory(session_factory) or
+                                 sessionmaker(bind=engine, class_=AsyncSession))
+        self._engine = engine if engine is not None else self._session_factory.kw.get("bind")
+        self._replicas = replicas
 
     @property
     def engine(self) -> AsyncEngine:
         assert self._engine is not None
         return self._engine
 
+    @property
+    def transaction_key(self) -> Any:
+        # sessions of the same engine (or of the same multi-bind factory) share an ambient transaction
+        return self._engine if self._engine is not None else self._session_factory
+
     @property
     def session(self) -> AsyncSession:
-        assert self._session is not None
-        return self._session
+        return self._state().session
+
+    def _create_session(self) -> AsyncSession:
+        replica = self._replicas.choose() if self._replicas is not None and is_read_only() else None
+        return self._session_factory(bind=replica) if replica is not None else self._session_factory()
 
     async def __aenter__(self):
-        self._session = AsyncSession(self.engine)
+        joined = _joined_for(self.transaction_key)
+        self._push_state(self._create_session() if joined is None else joined, joined is None)
 
     async def __aexit__(self, exc_type: Optional[Type[Exception]], exc_val: Optional[Exception], traceback):
-        await super().__aexit__(exc_type, exc_val, traceback)
-        await self.session.close()
+        try:
+            if self._state().owns_session:
+                try:
+                    await super().__aexit__(exc_type, exc_val, traceback)
+                    await await_invalidations(self.session.sync_session)   # commits made on the session directly
+                finally:
+                    await self.session.close()
+        finally:
+            self._pop_state()
+
+    async def begin(self, isolation_level: Optional[str] = None, read_only: bool = False,
+                    deferrable: bool = False) -> None:
+        await async_begin(self.session, isolation_level, read_only, deferrable)
+
+    async def gather(self, *calls: SessionCall, limit: Optional[int] = None) -> List[Any]:
+        return await concurrent.gather(self._create_session, *calls, limit=limit)
 
     async def commit(self):
         await self.session.commit()
+        await await_invalidations(self.session.sync_session)
 
     async def flush(self):
         await self.session.flush()
@@ -41,27 +171,46 @@ class AsyncSQLAlchemyUnitOfWork(AsyncBaseUnitOfWork):
         await self.session.rollback()
 
 
-class SyncSQLAlchemyUnitOfWork(SyncBaseUnitOfWork):
-    def __init__(self, engine: Engine) -> None:
-        self._engine = engine
-        self._session: Optional[Session] = None
+class SyncSQLAlchemyUnitOfWork(_TaskLocalState, SyncBaseUnitOfWork):
+    def __init__(self, engine: Optional[Engine] = None, replicas: Optional[SyncReplicaRouter] = None,
+                 session_factory: Optional[sessionmaker] = None) -> None:
+        super().__init__()
+        assert engine is not None or session_factory is not None
+        self._session_factory = _unwrap_session_factory(session_factory) or sessionmaker(bind=engine)
+        self._engine = engine if engine is not None else self._session_factory.kw.get("bind")
+        self._replicas = replicas
 
     @property
     def engine(self) -> Engine:
         assert self._engine is not None
         return self._engine
 
+    @property
+    def transaction_key(self) -> Any:
+        return self._engine if self._engine is not None else self._session_factory
+
     @property
     def session(self) -> Session:
-        assert self._session is not None
-        return self._session
+        return self._state().session
+
+    def _create_session(self) -> Session:
+        replica = self._replicas.choose() if self._replicas is not None and is_read_only() else None
+        return self._session_factory(bind=replica) if replica is not None else self._session_factory()
 
     def __enter__(self):
-        self._session = Session(self.engine)
+        joined = _joined_for(self.transaction_key)
+        self._push_state(self._create_session() if joined is None else joined, joined is None)
 
     def __exit__(self, exc_type: Optional[Type[Exception]], exc_val: Optional[Exception], traceback):
-        super().__exit__(exc_type, exc_val, traceback)
-        self.session.close()
+        try:
+            if self._state().owns_session:
+                super().__exit__(exc_type, exc_val, traceback)
+                self.session.close()
+        finally:
+            self._pop_state()
+
+    def begin(self, isolation_level: Optional[str] = None, read_only: bool = False, deferrable: bool = False) -> None:
+        sync_begin(self.session, isolation_level, read_only, deferrable)
 
     def commit(self):
         self.session.commit()
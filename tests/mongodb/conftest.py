@@ -1 +1,12 @@
+import pytest
+
+from pymfdata.mongodb.connection import AsyncMotor
 from tests import event_loop
+from tests.mongodb.domain.motor import FakeClient
+
+
+@pytest.fixture
+def test_motor() -> AsyncMotor:
+    motor = AsyncMotor(db_name="test", db_uri="mongodb://127.0.0.1:27017")
+    motor.client = FakeClient()
+    return motor
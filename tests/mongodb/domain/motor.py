@@ -0,0 +1,126 @@
+from bson import ObjectId, SON
+from pymongo.operations import InsertOne, UpdateOne
+from pymongo.results import BulkWriteResult
+from typing import Dict, List, Optional
+
+
+class FakeCursor:
+    def __init__(self, items: List[dict], plan: Optional[dict] = None) -> None:
+        self._items = items
+        self._plan = plan
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for item in self._items:
+            yield item
+
+    async def to_list(self, length: int) -> List[dict]:
+        return self._items[:length]
+
+    async def explain(self) -> dict:
+        return {"queryPlanner": {"winningPlan": self._plan}}
+
+
+class FakeCollection:
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.indexes: Dict[str, dict] = {"_id_": {"name": "_id_", "key": SON([("_id", 1)])}}
+        self.items: List[dict] = []
+        self.plan: dict = {"stage": "FETCH", "inputStage": {"stage": "IXSCAN"}}
+        self.calls: List[tuple] = []
+
+    def find(self, filter: Optional[dict] = None, projection=None, **kwargs) -> FakeCursor:
+        self.calls.append(("find", filter, kwargs))
+        return FakeCursor(self.items[:kwargs.get("limit") or None], self.plan)
+
+    def aggregate(self, pipeline: List[dict], **kwargs) -> FakeCursor:
+        self.calls.append(("aggregate", pipeline, kwargs))
+        return FakeCursor(self.items, self.plan)
+
+    async def estimated_document_count(self, **kwargs) -> int:
+        self.calls.append(("estimated_document_count", None, kwargs))
+        return len(self.items)
+
+    async def count_documents(self, filter: dict, **kwargs) -> int:
+        self.calls.append(("count_documents", filter, kwargs))
+        return len(self.items)
+
+    async def distinct(self, key: str, filter: Optional[dict] = None, **kwargs) -> list:
+        self.calls.append(("distinct", filter, kwargs))
+        return sorted({item[key] for item in self.items if key in item})
+
+    async def insert_one(self, document: dict, **kwargs) -> dict:
+        self.calls.append(("insert_one", document, kwargs))
+        self.items.append(document)
+        return document
+
+    async def bulk_write(self, operations, ordered: bool = True, **kwargs) -> BulkWriteResult:
+        self.calls.append(("bulk_write", list(operations), kwargs))
+        upserted = [{"index": i, "_id": ObjectId()} for i, op in enumerate(operations) if isinstance(op, UpdateOne)]
+        return BulkWriteResult({"nInserted": sum(isinstance(op, InsertOne) for op in operations), "nMatched": 0,
+                                "nModified": 0, "nRemoved": 0, "upserted": upserted}, True)
+
+    def list_indexes(self) -> FakeCursor:
+        return FakeCursor(list(self.indexes.values()))
+
+    async def create_indexes(self, models) -> List[str]:
+        for model in models:
+            document = dict(model.document)
+            self.indexes[document["name"]] = document
+        return [model.document["name"] for model in models]
+
+
+class FakeSession:
+    def __init__(self, client: "FakeClient") -> None:
+        self.client = client
+        self.in_transaction = False
+        self.ended = False
+        self.calls: List[str] = []
+
+    def start_transaction(self, **kwargs) -> None:
+        self.calls.append("start_transaction")
+        self.in_transaction = True
+
+    async def commit_transaction(self) -> None:
+        self.calls.append("commit_transaction")
+        if self.client.commit_errors:
+            raise self.client.commit_errors.pop(0)
+        self.in_transaction = False
+
+    async def abort_transaction(self) -> None:
+        self.calls.append("abort_transaction")
+        self.in_transaction = False
+
+    async def end_session(self) -> None:
+        self.ended = True
+
+
+class FakeDatabase:
+    def __init__(self) -> None:
+        self.collections: Dict[str, FakeCollection] = {}
+        self.commands: List[tuple] = []
+
+    def __getitem__(self, name: str) -> FakeCollection:
+        return self.collections.setdefault(name, FakeCollection(name))
+
+    async def command(self, *args, **kwargs) -> dict:
+        self.commands.append((args, kwargs))
+        return {"ok": 1}
+
+
+class FakeClient:
+    def __init__(self) -> None:
+        self.db = FakeDatabase()
+        self.read_preferences: List = []
+        self.sessions: List[FakeSession] = []
+        self.commit_errors: List[Exception] = []     # raised by the next commit_transaction calls
+
+    async def start_session(self) -> FakeSession:
+        self.sessions.append(FakeSession(self))
+        return self.sessions[-1]
+
+    def get_database(self, name: str, read_preference=None) -> FakeDatabase:
+        self.read_preferences.append(read_preference)
+        return self.db
@@ -0,0 +1,15 @@
+from pymfdata.mongodb.connection import AsyncMotor
+from pymfdata.mongodb.index import Index
+from pymfdata.mongodb.repository import AsyncRepository
+
+
+class MemoRepository(AsyncRepository):
+    _indexes = [
+        Index(["author", "-created_at"]),
+        Index(["slug"], unique=True),
+        Index(["created_at"], name="memo_ttl", expire_after_seconds=3600),
+        Index(["tags"], name="memo_tags", partial_filter={"published": True}),
+    ]
+
+    def __init__(self, motor: AsyncMotor) -> None:
+        super().__init__("memo", motor)
@@ -0,0 +1,18 @@
+from pymfdata.common.usecase import BaseUseCase
+from pymfdata.mongodb.connection import AsyncMotor
+from pymfdata.mongodb.transaction import async_transactional
+from pymfdata.mongodb.usecase import MotorUnitOfWork
+
+from tests.mongodb.domain.repository import MemoRepository
+
+
+class MemoUseCase(BaseUseCase[MotorUnitOfWork]):
+    def __init__(self, motor: AsyncMotor) -> None:
+        self._uow = MotorUnitOfWork(motor, max_commit_attempts=2)
+        self.repository = MemoRepository(motor)
+        self.attempts = 0
+
+    @async_transactional(backoff=0)
+    async def create(self, memo: dict) -> dict:
+        self.attempts += 1
+        return await self.repository.save(memo)
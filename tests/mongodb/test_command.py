@@ -0,0 +1,125 @@
+import logging
+import pytest
+from bson import SON
+from pymfdata.mongodb.connection import AsyncMotor
+from pymfdata.mongodb.index import Index
+from pymfdata.mongodb.usecase import current_session
+from pymongo.errors import OperationFailure
+from pymongo.operations import InsertOne, UpdateOne
+
+from tests.mongodb.domain.motor import FakeClient
+from tests.mongodb.domain.repository import MemoRepository
+from tests.mongodb.domain.usecase import MemoUseCase
+
+
+def _labeled_error(label: str) -> OperationFailure:
+    return OperationFailure(label, 112, {"errorLabels": [label]})
+
+
+class TestMongoCommand:
+    @pytest.fixture(autouse=True)
+    def setup(self, test_motor: AsyncMotor) -> None:
+        self.motor = test_motor
+        self.repository = MemoRepository(test_motor)
+        self.collection = test_motor.client.db["memo"]
+
+    @pytest.mark.asyncio
+    async def test_bulk_write(self):
+        operations = [InsertOne({"title": "a"}), UpdateOne({"slug": "b"}, {"$set": {"title": "b"}}, upsert=True),
+                      InsertOne({"title": "c"}), UpdateOne({"slug": "d"}, {"$set": {"title": "d"}}, upsert=True)]
+
+        summary = await self.repository.bulk_write(operations)
+        assert [call[1] for call in self.collection.calls if call[0] == "bulk_write"] == [operations]
+        assert summary.inserted_count == 2
+        assert sorted(summary.upserted_ids) == [1, 3]
+
+        assert await self.repository.bulk_write([]) == (0, 0, 0, 0, {})
+
+    @pytest.mark.asyncio
+    async def test_save_all_without_items(self):
+        assert await self.repository.save_all([]) == []
+        assert self.collection.calls == []
+
+    def test_index_model(self):
+        index = Index(["author", "-created_at"], unique=True, partial_filter={"published": True})
+        assert index.key_pattern == [("author", 1), ("created_at", -1)]
+        assert index.index_name == "author_1_created_at_-1"
+
+        document = index.to_model().document
+        assert (document["unique"], document["partialFilterExpression"]) == (True, {"published": True})
+        assert "expireAfterSeconds" not in document
+
+    @pytest.mark.asyncio
+    async def test_ensure_indexes(self):
+        created = await self.motor.ensure_indexes()
+        assert sorted(created["memo"]) == ["author_1_created_at_-1", "memo_tags", "memo_ttl", "slug_1"]
+        assert self.collection.indexes["memo_ttl"]["expireAfterSeconds"] == 3600
+
+        assert await self.motor.ensure_indexes() == {}
+
+    @pytest.mark.asyncio
+    async def test_ensure_indexes_per_motor(self):
+        other = AsyncMotor(db_name="other", db_uri="mongodb://127.0.0.1:27017")
+        other.client = FakeClient()
+
+        assert await other.ensure_indexes() == {}
+        assert other.client.db.collections == {}
+        assert list(self.motor.declared_indexes()) == ["memo"]
+
+    @pytest.mark.asyncio
+    async def test_ensure_indexes_with_changed_options(self, caplog):
+        self.collection.indexes["memo_ttl"] = {"name": "memo_ttl", "key": SON([("created_at", 1)]),
+                                               "expireAfterSeconds": 60}
+        self.collection.indexes["slug_1"] = {"name": "slug_1", "key": SON([("slug", 1)])}
+
+        with caplog.at_level(logging.WARNING, logger="pymfdata.mongodb.index"):
+            created = await self.motor.ensure_indexes()
+
+        assert sorted(created["memo"]) == ["author_1_created_at_-1", "memo_tags"]
+        assert self.motor.client.db.commands == [
+            (("collMod", "memo"), {"index": {"name": "memo_ttl", "expireAfterSeconds": 3600}})]
+        assert "slug_1" in caplog.text
+
+    @pytest.mark.asyncio
+    async def test_transactional_retries_transient_error(self):
+        usecase = MemoUseCase(self.motor)
+        self.motor.client.commit_errors = [_labeled_error("TransientTransactionError")]
+
+        await usecase.create({"title": "retry"})
+        sessions = self.motor.client.sessions
+        assert usecase.attempts == 2
+        assert sessions[0].calls == ["start_transaction", "commit_transaction", "abort_transaction"]
+        assert sessions[1].calls == ["start_transaction", "commit_transaction"]
+        assert all(session.ended for session in sessions)
+        assert current_session() is None
+
+    @pytest.mark.asyncio
+    async def test_commit_retries_unknown_commit_result(self):
+        usecase = MemoUseCase(self.motor)
+        self.motor.client.commit_errors = [_labeled_error("UnknownTransactionCommitResult")]
+
+        await usecase.create({"title": "commit"})
+        assert usecase.attempts == 1
+        assert self.motor.client.sessions[0].calls == ["start_transaction", "commit_transaction", "commit_transaction"]
+
+        self.motor.client.commit_errors = [_labeled_error("UnknownTransactionCommitResult") for _ in range(2)]
+        with pytest.raises(OperationFailure):
+            await usecase.create({"title": "commit"})
+        assert usecase.attempts == 2
+
+    @pytest.mark.asyncio
+    async def test_session_is_scoped_to_its_client(self):
+        usecase = MemoUseCase(self.motor)
+        other = AsyncMotor(db_name="test", db_uri="mongodb://127.0.0.1:27017")
+        other.client = FakeClient()
+
+        async with usecase.uow:
+            session = self.motor.client.sessions[0]
+            assert self.repository._session is session
+            assert MemoRepository(other)._session is None
+
+            await MemoRepository(other).save({"title": "other"})
+            assert other.client.db["memo"].calls[-1][2]["session"] is None
+
+            await MemoUseCase(other).create({"title": "other"})
+            assert other.client.sessions[0].calls == ["start_transaction", "commit_transaction"]
@@ -0,0 +1,140 @@
+import logging
+import pytest
+from bson import ObjectId
+from pymfdata.common.pagination import encode_cursor
+from pymfdata.mongodb.connection import AsyncMotor, MotorPoolConfig, MotorPoolStats, _PoolStatsListener
+from pymfdata.mongodb.index import has_collscan
+from pymfdata.mongodb.pipeline import Pipeline
+from pymfdata.mongodb.repository import _page_projection, _range_filter
+from pymongo import ReadPreference
+
+from tests.mongodb.domain.repository import MemoRepository
+
+
+class TestMongoQuery:
+    @pytest.fixture(autouse=True)
+    def setup(self, test_motor: AsyncMotor) -> None:
+        self.motor = test_motor
+        self.repository = MemoRepository(test_motor)
+        self.collection = test_motor.client.db["memo"]
+
+    def test_range_filter(self):
+        _id = ObjectId()
+        cursor = encode_cursor([str(_id)])
+
+        assert _range_filter({"author": "neon"}, None, False) == {"author": "neon"}
+        assert _range_filter({"author": "neon"}, cursor, False) == {"author": "neon", "_id": {"$gt": _id}}
+        assert _range_filter({"_id": {"$in": [_id]}}, cursor, True) == {
+            "$and": [{"_id": {"$in": [_id]}}, {"_id": {"$lt": _id}}]}
+
+        with pytest.raises(ValueError):
+            _range_filter(None, encode_cursor([str(_id), 1]), False)
+
+    def test_page_projection(self):
+        assert _page_projection(["title"]) == ["title"]
+        assert _page_projection({"title": 1, "_id": 0}) == {"title": 1, "_id": True}
+
+    @pytest.mark.asyncio
+    async def test_find_page(self):
+        self.collection.items = [{"_id": ObjectId()} for _ in range(3)]
+
+        page = await self.repository.find_page(limit=2, filter={"author": "neon"}, descending=True)
+        assert page.items == self.collection.items[:2]
+        assert page.next_cursor == encode_cursor([str(self.collection.items[1]["_id"])])
+
+        _, filter, options = self.collection.calls[-1]
+        assert (filter, options["sort"], options["limit"]) == ({"author": "neon"}, [("_id", -1)], 3)
+
+    @pytest.mark.asyncio
+    async def test_find_all(self):
+        self.collection.items = [{"_id": ObjectId()} for _ in range(3)]
+
+        items = [item async for item in self.repository.find_all(batch_size=2)]
+        assert items == self.collection.items
+        assert self.collection.calls[-1][2]["batch_size"] == 2
+
+    def test_has_collscan(self):
+        assert has_collscan({"stage": "SORT", "inputStage": {"stage": "COLLSCAN"}})
+        assert has_collscan({"stage": "OR", "inputStages": [{"stage": "IXSCAN"}, {"stage": "COLLSCAN"}]})
+        assert not has_collscan({"stage": "FETCH", "inputStage": {"stage": "IXSCAN"}})
+
+    @pytest.mark.asyncio
+    async def test_explain_collscan_in_dev_mode(self, caplog):
+        self.collection.plan = {"stage": "COLLSCAN"}
+        self.motor.dev_mode = True
+
+        with caplog.at_level(logging.WARNING, logger="pymfdata.mongodb.explain"):
+            for author in ("neon", "kid"):
+                assert [item async for item in self.repository.find_all({"author": author})] == []
+
+        assert caplog.text.count("COLLSCAN on memo") == 1
+        assert sum(1 for call in self.collection.calls if call[0] == "find") == 3
+
+    def test_pool_config(self):
+        assert MotorPoolConfig().client_kwargs() == {"maxPoolSize": 100, "minPoolSize": 0}
+        assert MotorPoolConfig(max_pool_size=10, min_pool_size=2, max_idle_time_ms=60000, wait_queue_timeout_ms=500,
+                               compressors=["zstd", "snappy"]).client_kwargs() == {
+            "maxPoolSize": 10, "minPoolSize": 2, "maxIdleTimeMS": 60000, "waitQueueTimeoutMS": 500,
+            "compressors": "zstd,snappy"}
+
+    def test_pool_stats(self):
+        listener = _PoolStatsListener()
+        for handle in (listener.connection_created, listener.connection_created, listener.connection_check_out_started,
+                       listener.connection_checked_out, listener.connection_check_out_failed,
+                       listener.connection_checked_in, listener.connection_closed):
+            handle(None)
+
+        stats = listener.stats()
+        assert stats._replace(wait_total=0.0) == MotorPoolStats(1, 0, 1, 2, 1, 1, 0.0, 1)
+        assert stats.wait_total >= 0
+
+    def test_cached_handles(self):
+        collection = self.motor.collection("memo")
+        assert self.motor.collection("memo") is collection
+        assert self.motor.database() is self.motor.database()
+
+        self.motor.collection("memo", ReadPreference.SECONDARY)
+        self.motor.collection("memo", ReadPreference.SECONDARY)
+        assert self.motor.client.read_preferences == [None, ReadPreference.SECONDARY]
+
+    def test_pipeline(self):
+        base = Pipeline().match({"published": True})
+        pipeline = (base.lookup("user", "author", "_id", "user").unwind("user", preserve_empty=True)
+                    .group("author", total={"$sum": 1}).sort("-total", "_id").skip(10).limit(5).project(["total"]))
+
+        assert len(base) == 1
+        assert len(pipeline) == 8
+        assert pipeline.build() == [
+            {"$match": {"published": True}},
+            {"$lookup": {"from": "user", "localField": "author", "foreignField": "_id", "as": "user"}},
+            {"$unwind": {"path": "$user", "preserveNullAndEmptyArrays": True}},
+            {"$group": {"_id": "$author", "total": {"$sum": 1}}},
+            {"$sort": {"total": -1, "_id": 1}},
+            {"$skip": 10},
+            {"$limit": 5},
+            {"$project": {"total": 1}},
+        ]
+        assert Pipeline().group(None, total={"$sum": 1}).build() == [{"$group": {"_id": None, "total": {"$sum": 1}}}]
+
+    @pytest.mark.asyncio
+    async def test_aggregate_stream(self):
+        self.collection.items = [{"_id": "neon", "total": 2}]
+        pipeline = Pipeline().group("author", total={"$sum": 1})
+
+        items = [item async for item in self.repository.aggregate_stream(pipeline, batch_size=100, hint="author_1")]
+        assert items == self.collection.items
+        assert self.collection.calls[-1] == ("aggregate", pipeline.build(), {
+            "session": None, "batchSize": 100, "allowDiskUse": False, "hint": "author_1"})
+
+    @pytest.mark.asyncio
+    async def test_count_and_distinct(self):
+        self.collection.items = [{"author": "neon"}, {"author": "kid"}, {"author": "neon"}]
+
+        assert await self.repository.count() == 3
+        assert self.collection.calls[-1][0] == "estimated_document_count"
+        assert await self.repository.count({"author": "neon"}) == 3
+        assert self.collection.calls[-1][:2] == ("count_documents", {"author": "neon"})
+        assert await self.repository.count(hint="author_1") == 3
+        assert self.collection.calls[-1][2]["hint"] == "author_1"
+
+        assert await self.repository.distinct("author") == ["kid", "neon"]
@@ -3,3 +3,8 @@ from pydantic import BaseModel, Field
 
 class MemoRequest(BaseModel):
     content: str = Field(title="Memo content")
+
+
+class MemoResponse(BaseModel):
+    id: int
+    content: str
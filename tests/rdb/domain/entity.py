@@ -1,6 +1,7 @@
 from pymfdata.rdb.mapper import Base
 from sqlalchemy import BigInteger, Column, String
-from typing import Union
+from sqlalchemy.orm import foreign, relationship
+from typing import List, Union
 
 
 class MemoEntity(Base):
@@ -8,3 +9,13 @@ class MemoEntity(Base):
 
     id: Union[int, Column] = Column(BigInteger, primary_key=True, autoincrement=True, nullable=False)
     content: Union[str, Column] = Column(String(128), nullable=True)
+
+    tags: List["MemoTagEntity"] = relationship("MemoTagEntity", viewonly=True,
+                                               primaryjoin="MemoEntity.id == foreign(MemoTagEntity.memo_id)")
+
+
+class MemoTagEntity(Base):
+    __tablename__ = 'memo_tag'
+
+    memo_id: Union[int, Column] = Column(BigInteger, primary_key=True, nullable=False)
+    name: Union[str, Column] = Column(String(32), primary_key=True, nullable=False)
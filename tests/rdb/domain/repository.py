@@ -1,13 +1,55 @@
-from pymfdata.rdb.repository import (AsyncRepository, BaseAsyncRepository,
-                                     BaseSyncRepository, SyncRepository, AsyncSession, Session)
+import asyncio
+
+from pymfdata.rdb.cache import EntityCache, InMemoryCacheBackend
+from pymfdata.rdb.repository import (AsyncRepository, BaseAsyncRepository, BaseSyncRepository, LoadStrategy,
+                                     SyncRepository, AsyncSession, Session)
 from sqlalchemy import select
 from typing import List, Optional
 
-from tests.rdb.domain.entity import MemoEntity
+from tests.rdb.domain.entity import MemoEntity, MemoTagEntity
 from tests.rdb.domain.query_model import MemoQuery
 
 
 class AsyncMemoRepository(AsyncRepository[MemoEntity, int]):
+    _load_profiles = {"default": [("tags", LoadStrategy.RAISE)], "with_tags": ["tags"]}
+
+    def __init__(self, session: Optional[AsyncSession]) -> None:
+        self._session = session
+
+
+class AsyncInMemoryCacheBackend(InMemoryCacheBackend):
+    async def get(self, key: str) -> Optional[dict]:
+        await asyncio.sleep(0)
+        return super().get(key)
+
+    async def set(self, key: str, value: dict, ttl: Optional[float] = None) -> None:
+        await asyncio.sleep(0)
+        super().set(key, value, ttl)
+
+    async def delete(self, key: str) -> None:
+        await asyncio.sleep(0.05)      # a write slower than the following read, as with a remote store
+        super().delete(key)
+
+    async def clear(self) -> None:
+        await asyncio.sleep(0)
+        super().clear()
+
+
+class AsyncCachedMemoRepository(AsyncRepository[MemoEntity, int]):
+    _entity_cache = EntityCache(InMemoryCacheBackend())
+
+    def __init__(self, session: Optional[AsyncSession]) -> None:
+        self._session = session
+
+
+class AsyncCachedMemoTagRepository(AsyncRepository[MemoTagEntity, tuple]):
+    _entity_cache = EntityCache(AsyncInMemoryCacheBackend())
+
+    def __init__(self, session: Optional[AsyncSession]) -> None:
+        self._session = session
+
+
+class AsyncMemoTagRepository(AsyncRepository[MemoTagEntity, tuple]):
     def __init__(self, session: Optional[AsyncSession]) -> None:
         self._session = session
 
@@ -1,36 +1,53 @@
 from sqlalchemy.engine import Engine
-from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.orm import Session, sessionmaker
+from typing import List, Optional
 
 from pymfdata.common.usecase import BaseUseCase
+from pymfdata.rdb.retry import RetryPolicy
+from pymfdata.rdb.routing import AsyncReplicaRouter, SyncReplicaRouter
 from pymfdata.rdb.usecase import AsyncSQLAlchemyUnitOfWork, SyncSQLAlchemyUnitOfWork
-from pymfdata.rdb.transaction import async_transactional
+from pymfdata.rdb.transaction import async_transactional, sync_transactional, Propagation, RefreshPolicy
 
 from tests.rdb.domain.dto import MemoRequest
-from tests.rdb.domain.entity import MemoEntity
-from tests.rdb.domain.repository import (AsyncMemoRepository, AsyncMemoQueryRepository,
+from tests.rdb.domain.entity import MemoEntity, MemoTagEntity
+from tests.rdb.domain.repository import (AsyncMemoRepository, AsyncMemoQueryRepository, AsyncMemoTagRepository,
                                          SyncMemoRepository, SyncMemoQueryRepository)
 
 
+flaky_retry = RetryPolicy(max_attempts=3, backoff=0, retry_on=ConnectionResetError)
+
+
 class AsyncMemoUseCaseUnitOfWork(AsyncSQLAlchemyUnitOfWork):
-    def __init__(self, engine: AsyncEngine) -> None:
-        super().__init__(engine)
+    def __init__(self, engine: Optional[AsyncEngine] = None, replicas: Optional[AsyncReplicaRouter] = None,
+                 session_factory: Optional[sessionmaker] = None) -> None:
+        super().__init__(engine, replicas, session_factory)
 
-    async def __aenter__(self):
-        await super().__aenter__()
+    @property
+    def memo_repository(self) -> AsyncMemoRepository:
+        return AsyncMemoRepository(self.session)
 
-        self.memo_repository: AsyncMemoRepository = AsyncMemoRepository(self.session)
-        self.query_repository: AsyncMemoQueryRepository = AsyncMemoQueryRepository(self.session)
+    @property
+    def memo_tag_repository(self) -> AsyncMemoTagRepository:
+        return AsyncMemoTagRepository(self.session)
+
+    @property
+    def query_repository(self) -> AsyncMemoQueryRepository:
+        return AsyncMemoQueryRepository(self.session)
 
 
 class MemoUseCaseUnitOfWork(SyncSQLAlchemyUnitOfWork):
-    def __init__(self, engine: Engine) -> None:
-        super().__init__(engine)
+    def __init__(self, engine: Optional[Engine] = None, replicas: Optional[SyncReplicaRouter] = None,
+                 session_factory: Optional[sessionmaker] = None) -> None:
+        super().__init__(engine, replicas, session_factory)
 
-    def __enter__(self):
-        super().__enter__()
+    @property
+    def memo_repository(self) -> SyncMemoRepository:
+        return SyncMemoRepository(self.session)
 
-        self.memo_repository: SyncMemoRepository = SyncMemoRepository(self.session)
-        self.query_repository: SyncMemoQueryRepository = SyncMemoQueryRepository(self.session)
+    @property
+    def query_repository(self) -> SyncMemoQueryRepository:
+        return SyncMemoQueryRepository(self.session)
 
 
 class MemoUseCase(BaseUseCase[AsyncMemoUseCaseUnitOfWork]):
@@ -47,3 +64,118 @@ class MemoUseCase(BaseUseCase[AsyncMemoUseCaseUnitOfWork]):
 
         self.uow.memo_repository.create(entity)
         return entity
+
+    @async_transactional(refresh=RefreshPolicy.EAGER)
+    async def create_memo_eagerly(self, req: MemoRequest):
+        entity = MemoEntity(**req.dict())
+
+        self.uow.memo_repository.create(entity)
+        return entity
+
+    @async_transactional()
+    async def create_memos(self, reqs: List[MemoRequest]):
+        entities = [MemoEntity(**req.dict()) for req in reqs]
+
+        await self.uow.memo_repository.create_all(entities)
+        return entities
+
+    @async_transactional(propagation=Propagation.MANDATORY)
+    async def create_memo_in_transaction(self, req: MemoRequest):
+        entity = MemoEntity(**req.dict())
+
+        self.uow.memo_repository.create(entity)
+        await self.uow.flush()
+        return entity
+
+    @async_transactional(propagation=Propagation.NESTED)
+    async def add_memo_tag(self, memo_id: int, name: str):
+        self.uow.memo_tag_repository.create(MemoTagEntity(memo_id=memo_id, name=name))
+        await self.uow.flush()
+
+        if not name.isidentifier():
+            raise ValueError("invalid tag name: {}".format(name))
+
+    @async_transactional()
+    async def create_memo_with_tags(self, req: MemoRequest, tags: List[str]):
+        entity = await self.create_memo_in_transaction(req)
+        for tag in tags:
+            try:
+                await self.add_memo_tag(entity.id, tag)
+            except ValueError:
+                pass
+
+        return entity
+
+    @async_transactional()
+    async def run_and_fail(self, call):
+        await call()
+        raise LookupError("rolled back")
+
+    @async_transactional(retry=flaky_retry)
+    async def create_memo_flaky(self, req: MemoRequest, failures: List[Exception]):
+        entity = MemoEntity(**req.dict())
+
+        self.uow.memo_repository.create(entity)
+        await self.uow.flush()
+        if failures:
+            raise failures.pop()
+
+        return entity
+
+    @async_transactional(read_only=True, isolation_level="SERIALIZABLE")
+    async def find_isolation_level(self):
+        connection = await self.uow.session.connection()
+        return await connection.get_isolation_level()
+
+
+class SyncMemoUseCase(BaseUseCase[MemoUseCaseUnitOfWork]):
+    def __init__(self, uow: MemoUseCaseUnitOfWork) -> None:
+        self._uow = uow
+
+    @sync_transactional(refresh=RefreshPolicy.FULL)
+    def create_memos(self, reqs: List[MemoRequest]):
+        entities = [MemoEntity(**req.dict()) for req in reqs]
+
+        for entity in entities:
+            self.uow.memo_repository.create(entity)
+        return entities
+
+
+class MemoSessionUseCase:
+    def __init__(self, session: AsyncSession) -> None:
+        self.session = session
+        self.memo_repository = AsyncMemoRepository(session)
+
+    @async_transactional()
+    async def create_memo_and_fail(self, req: MemoRequest, call):
+        self.memo_repository.create(MemoEntity(**req.dict()))
+        await self.session.flush()
+        await call()
+        raise LookupError("rolled back")
+
+    @async_transactional(propagation=Propagation.REQUIRES_NEW)
+    async def create_memo_in_new_transaction(self, req: MemoRequest):
+        entity = MemoEntity(**req.dict())
+
+        self.memo_repository.create(entity)
+        return entity
+
+
+class SyncMemoSessionUseCase:
+    def __init__(self, session: Session) -> None:
+        self.session = session
+        self.memo_repository = SyncMemoRepository(session)
+
+    @sync_transactional()
+    def create_memo_and_fail(self, req: MemoRequest, call):
+        self.memo_repository.create(MemoEntity(**req.dict()))
+        self.session.flush()
+        call()
+        raise LookupError("rolled back")
+
+    @sync_transactional(propagation=Propagation.REQUIRES_NEW)
+    def create_memo_in_new_transaction(self, req: MemoRequest):
+        entity = MemoEntity(**req.dict())
+
+        self.memo_repository.create(entity)
+        return entity
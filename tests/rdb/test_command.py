@@ -1,14 +1,30 @@
+import asyncio
 import pytest
 from pymfdata.rdb.connection import AsyncSQLAlchemy, SyncSQLAlchemy
+from pymfdata.rdb.instrumentation import HistogramSink, MetricsSink, QueryInstrumentation
+from pymfdata.rdb.pool import PoolConfig
+from pymfdata.rdb.repository import AsyncRepository, LoadStrategy, OnConflict, _returned_keys
+from pymfdata.rdb.retry import is_retryable_error
+from pymfdata.rdb.routing import AsyncReplicaRouter
+from pymfdata.rdb.transaction import IllegalTransactionStateError
+from pymfdata.rdb.usecase import transaction_options
+from sqlalchemy import BigInteger, Column, Integer, event
+from sqlalchemy.exc import DBAPIError, InvalidRequestError
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import Session, declarative_base, selectinload, sessionmaker
 
-from tests.rdb.domain.dto import MemoRequest
-from tests.rdb.domain.entity import MemoEntity
-from tests.rdb.domain.usecase import AsyncMemoUseCaseUnitOfWork, MemoUseCaseUnitOfWork, MemoUseCase
+from tests.rdb.domain.dto import MemoRequest, MemoResponse
+from tests.rdb.domain.entity import MemoEntity, MemoTagEntity
+from tests.rdb.domain.repository import AsyncCachedMemoRepository, AsyncCachedMemoTagRepository, AsyncMemoRepository
+from tests.rdb.domain.usecase import (AsyncMemoUseCaseUnitOfWork, MemoUseCaseUnitOfWork, MemoUseCase,
+                                      MemoSessionUseCase, SyncMemoSessionUseCase, SyncMemoUseCase, flaky_retry)
 
 
 class TestRdbCommand:
     @pytest.fixture(autouse=True)
     def setup(self, test_db_connection: SyncSQLAlchemy, test_async_db_connection: AsyncSQLAlchemy) -> None:
+        self.async_db = test_async_db_connection
+        self.sync_db = test_db_connection
         self.sync_uow = MemoUseCaseUnitOfWork(test_db_connection._engine)
         self.uow = AsyncMemoUseCaseUnitOfWork(test_async_db_connection._engine)
         self.uc = MemoUseCase(self.uow)
@@ -45,3 +61,539 @@ class TestRdbCommand:
 
         item = await self.uc.create_memo(req)
         assert item.id is not None
+
+    @pytest.mark.asyncio
+    async def test_eager_refresh_for_transactional(self):
+        item = await self.uc.create_memo_eagerly(MemoRequest(content="Eager Memo"))
+        assert item.id is not None
+        assert item.content == "Eager Memo"
+
+    @pytest.mark.asyncio
+    async def test_batch_refresh_for_transactional(self):
+        items = await self.uc.create_memos([MemoRequest(content="Batch Memo 1"), MemoRequest(content="Batch Memo 2")])
+        assert [item.content for item in items] == ["Batch Memo 1", "Batch Memo 2"]
+
+    def test_batch_refresh_for_sync_transactional(self):
+        items = SyncMemoUseCase(self.sync_uow).create_memos([MemoRequest(content="Sync Batch Memo 1"),
+                                                             MemoRequest(content="Sync Batch Memo 2")])
+        assert [item.content for item in items] == ["Sync Batch Memo 1", "Sync Batch Memo 2"]
+
+    @pytest.mark.asyncio
+    async def test_nested_propagation_for_transactional(self):
+        commits = []
+
+        def count_commit(session):
+            if not session.in_nested_transaction():
+                commits.append(session)
+
+        event.listen(Session, "after_commit", count_commit)
+        try:
+            item = await self.uc.create_memo_with_tags(MemoRequest(content="Tagged Memo"), ["python", "not valid"])
+        finally:
+            event.remove(Session, "after_commit", count_commit)
+
+        assert len(commits) == 1
+        async with self.uow:
+            assert await self.uow.memo_tag_repository.find_by_pk((item.id, "python")) is not None
+            assert await self.uow.memo_tag_repository.find_by_pk((item.id, "not valid")) is None
+
+    @pytest.mark.asyncio
+    async def test_mandatory_propagation_for_transactional(self):
+        with pytest.raises(IllegalTransactionStateError):
+            await self.uc.create_memo_in_transaction(MemoRequest(content="Orphan Memo"))
+
+    @pytest.mark.asyncio
+    async def test_propagation_across_engines_for_transactional(self):
+        engine = create_async_engine(self.async_db.engine.url)
+        other = MemoUseCase(AsyncMemoUseCaseUnitOfWork(engine))
+        try:
+            with pytest.raises(LookupError):
+                await self.uc.run_and_fail(lambda: other.create_memo(MemoRequest(content="Other Engine Memo")))
+            with pytest.raises(IllegalTransactionStateError):
+                await self.uc.run_and_fail(lambda: other.create_memo_in_transaction(MemoRequest(content="Orphan")))
+        finally:
+            await engine.dispose()
+
+        async with self.uow:
+            assert len(await self.uow.memo_repository.find_all(content="Other Engine Memo")) == 1
+
+    @pytest.mark.asyncio
+    async def test_requires_new_propagation_in_session(self):
+        async with self.async_db.session() as session:
+            uc = MemoSessionUseCase(session)
+            with pytest.raises(IllegalTransactionStateError):
+                await uc.create_memo_and_fail(MemoRequest(content="Outer Session Memo"), lambda: (
+                    uc.create_memo_in_new_transaction(MemoRequest(content="Inner Session Memo"))))
+
+        async with self.uow:
+            for content in ("Outer Session Memo", "Inner Session Memo"):
+                assert await self.uow.memo_repository.find_all(content=content) == []
+
+    def test_requires_new_propagation_in_sync_session(self):
+        with self.sync_db.session() as session:
+            uc = SyncMemoSessionUseCase(session)
+            with pytest.raises(IllegalTransactionStateError):
+                uc.create_memo_and_fail(MemoRequest(content="Outer Sync Session Memo"), lambda: (
+                    uc.create_memo_in_new_transaction(MemoRequest(content="Inner Sync Session Memo"))))
+
+        with self.sync_uow:
+            for content in ("Outer Sync Session Memo", "Inner Sync Session Memo"):
+                assert self.sync_uow.memo_repository.find_all(content=content) == []
+
+    @pytest.mark.asyncio
+    async def test_retry_for_transactional(self):
+        attempts = flaky_retry.attempts
+        item = await self.uc.create_memo_flaky(MemoRequest(content="Flaky Memo"), [ConnectionResetError()] * 2)
+
+        assert flaky_retry.attempts == attempts + 3
+        async with self.uow:
+            items = await self.uow.memo_repository.find_all(content="Flaky Memo")
+            assert [memo.id for memo in items] == [item.id]
+
+        with pytest.raises(ConnectionResetError):
+            await self.uc.create_memo_flaky(MemoRequest(content="Flaky Memo"), [ConnectionResetError()] * 3)
+
+    @pytest.mark.asyncio
+    async def test_multi_bind_session_factory_for_transactional(self):
+        engine = self.async_db.engine
+        session_factory = sessionmaker(class_=AsyncSession, binds={MemoEntity: engine, MemoTagEntity: engine})
+        uc = MemoUseCase(AsyncMemoUseCaseUnitOfWork(session_factory=session_factory))
+
+        item = await uc.create_memo_flaky(MemoRequest(content="Multi Bind Memo"), [ConnectionResetError()])
+        assert item.id is not None
+
+    def test_retryable_error_by_dialect(self):
+        class DeadlockDetected(Exception):
+            pgcode = "40P01"
+
+        error = DBAPIError("UPDATE memo SET content = %(content)s", {}, DeadlockDetected())
+        assert is_retryable_error(error, "postgresql")
+        assert not is_retryable_error(error, "sqlite")
+        assert is_retryable_error(error, "")
+        assert not is_retryable_error(ValueError(), "postgresql")
+
+    @pytest.mark.asyncio
+    async def test_isolation_level_for_transactional(self):
+        assert await self.uc.find_isolation_level() == "SERIALIZABLE"
+
+    def test_read_only_transaction_options(self):
+        assert transaction_options("postgresql", "REPEATABLE READ", read_only=True, deferrable=True) == {
+            "isolation_level": "REPEATABLE READ", "postgresql_readonly": True, "postgresql_deferrable": True}
+        assert transaction_options("sqlite", read_only=True) == {}
+
+    @pytest.mark.asyncio
+    async def test_concurrent_tasks_for_shared_uow(self):
+        self.async_db.init_session_factory()
+        uow = AsyncMemoUseCaseUnitOfWork(session_factory=self.async_db.session_factory)
+
+        async def create(content: str):
+            async with uow:
+                session = uow.session
+                uow.memo_repository.create(MemoEntity(content=content))
+                await asyncio.sleep(0)
+
+                assert uow.session is session
+                assert uow.memo_repository.session is session
+                await uow.commit()
+                return session
+
+        sessions = await asyncio.gather(create("Concurrent Memo 1"), create("Concurrent Memo 2"))
+        assert sessions[0] is not sessions[1]
+
+    @pytest.mark.asyncio
+    async def test_plain_attributes_for_shared_uow(self):
+        uow = AsyncMemoUseCaseUnitOfWork(self.async_db.engine)
+        async with uow:
+            uow.label = "memo"
+
+        async def read_label():
+            return uow.label
+
+        assert await asyncio.create_task(read_label()) == "memo"
+
+    @pytest.mark.asyncio
+    async def test_pool_warm_up_and_stats(self):
+        db = AsyncSQLAlchemy(self.async_db.engine.url)
+        await db.connect(pool=PoolConfig(size=2, max_overflow=1))
+        try:
+            await db.warm_up()
+            stats = db.pool_stats()
+            assert (stats.size, stats.checked_out, stats.idle) == (2, 0, 2)
+            assert stats.wait.count == 2
+
+            async with db.engine.connect():
+                assert db.pool_stats().checked_out == 1
+        finally:
+            await db.disconnect()
+
+    @pytest.mark.asyncio
+    async def test_gather_for_async_connection(self):
+        items = await self.async_db.gather(lambda session: AsyncMemoRepository(session).find_by_pk(1),
+                                           lambda session: AsyncMemoRepository(session).find_by_pk(2),
+                                           lambda session: AsyncMemoRepository(session).find_by_pk(0), limit=2)
+        assert [item.id if item is not None else None for item in items] == [1, 2, None]
+
+        cancelled = []
+
+        async def slow(session):
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(session)
+                raise
+
+        async def fail(session):
+            raise LookupError("missing memo")
+
+        with pytest.raises(LookupError):
+            await self.uow.gather(slow, fail)
+        assert len(cancelled) == 1
+
+    @pytest.mark.asyncio
+    async def test_projection_for_async_uow(self):
+        async with self.uow:
+            items = await self.uow.memo_repository.find_all_as(MemoResponse, content='Sample Async Data')
+            assert items and all(isinstance(item, MemoResponse) for item in items)
+
+            rows = await self.uow.memo_repository.select_columns('id', MemoEntity.content, into=tuple, id=items[0].id)
+            assert rows == [(items[0].id, 'Sample Async Data')]
+            assert len(self.uow.session.identity_map) == 0
+
+    def test_projection_for_sync_uow(self):
+        with self.sync_uow:
+            rows = self.sync_uow.memo_repository.select_columns('id', 'content', into=dict, content='Sample Sync Data')
+            assert rows and set(rows[0]) == {'id', 'content'}
+
+    @pytest.mark.asyncio
+    async def test_loading_profiles_for_async_uow(self):
+        async with self.uow:
+            await self.uow.memo_tag_repository.bulk_upsert([{'memo_id': 1, 'name': 'loader'}])
+
+            item = await self.uow.memo_repository.find_by_pk(1, load="with_tags")
+            assert 'loader' in [tag.name for tag in item.tags]
+
+            items = await self.uow.memo_repository.find_all(load=[("tags", LoadStrategy.JOINED)], id=1)
+            assert items == [item]
+
+        async with self.uow:
+            item = await self.uow.memo_repository.find_by_pk(1)
+            with pytest.raises(InvalidRequestError):
+                item.tags
+
+    @pytest.mark.asyncio
+    async def test_loader_option_objects_skip_statement_cache(self):
+        async with self.uow:
+            repository = self.uow.memo_repository
+            await repository.find_all(load=[selectinload(MemoEntity.tags)], id=1)
+            size = repository.statement_cache_info().currsize
+
+            for _ in range(5):
+                await repository.find_all(load=[selectinload(MemoEntity.tags)], id=1)
+            assert repository.statement_cache_info().currsize == size
+
+    def test_reserved_filter_keys(self):
+        class LimitEntity(declarative_base()):
+            __tablename__ = 'limit_entity'
+
+            id = Column(BigInteger, primary_key=True)
+            limit = Column(Integer)
+
+        with pytest.raises(TypeError, match="limit"):
+            class LimitRepository(AsyncRepository[LimitEntity, int]):
+                pass
+
+    @pytest.mark.asyncio
+    async def test_stream_all_for_async_uow(self):
+        async with self.uow:
+            items = [item async for item in self.uow.memo_repository.stream_all(batch_size=1)]
+            assert items != []
+
+            async for partition in self.uow.memo_repository.stream_all(batch_size=1, partition=True):
+                assert len(partition) == 1
+
+    def test_stream_all_for_sync_uow(self):
+        with self.sync_uow:
+            items = list(self.sync_uow.memo_repository.stream_all(batch_size=1))
+            assert items != []
+
+            for partition in self.sync_uow.memo_repository.stream_all(batch_size=1, partition=True):
+                assert len(partition) == 1
+
+    @pytest.mark.asyncio
+    async def test_find_page_for_async_uow(self):
+        async with self.uow:
+            first = await self.uow.memo_repository.find_page(limit=1)
+            assert len(first.items) == 1
+            assert first.has_next
+
+            second = await self.uow.memo_repository.find_page(after=first.next_cursor, limit=1)
+            assert second.items[0].id > first.items[0].id
+
+    def test_find_page_for_sync_uow(self):
+        with self.sync_uow:
+            first = self.sync_uow.memo_repository.find_page(limit=1, order_by=['-id'])
+            assert len(first.items) == 1
+
+            second = self.sync_uow.memo_repository.find_page(after=first.next_cursor, limit=1, order_by=['-id'])
+            assert second.items[0].id < first.items[0].id
+
+    def test_find_page_with_nullable_order_for_sync_uow(self):
+        with self.sync_uow:
+            self.sync_uow.memo_repository.bulk_insert([{'content': None}] * 3 + [{'content': 'Nullable Page Data'}])
+
+            ids, after = [], None
+            while True:
+                page = self.sync_uow.memo_repository.find_page(after=after, limit=2, order_by=['-content'])
+                ids.extend(item.id for item in page.items)
+                if not page.has_next:
+                    break
+                after = page.next_cursor
+
+            assert sorted(ids) == sorted(item.id for item in self.sync_uow.memo_repository.find_all())
+
+    @pytest.mark.asyncio
+    async def test_bulk_insert_for_async_uow(self):
+        async with self.uow:
+            keys = await self.uow.memo_repository.bulk_insert(
+                [{'content': 'Bulk Async Data 1'}, MemoEntity(content='Bulk Async Data 2')], chunk_size=1)
+            await self.uow.commit()
+
+            assert len(keys) == 2
+            items = await self.uow.memo_repository.find_by_pks(keys)
+            assert [item.content for item in items] == ['Bulk Async Data 1', 'Bulk Async Data 2']
+
+    def test_bulk_insert_keeps_input_order_for_sync_uow(self):
+        with self.sync_uow:
+            keys = self.sync_uow.memo_repository.bulk_insert([
+                {'content': 'Ordered Sync Data 1'}, {'id': 1000000, 'content': 'Ordered Sync Data 2'},
+                {'content': 'Ordered Sync Data 3'}])
+            items = self.sync_uow.memo_repository.find_by_pks(keys)
+            assert [item.content for item in items] == ['Ordered Sync Data {}'.format(n) for n in range(1, 4)]
+
+            keys = self.sync_uow.memo_repository.bulk_insert(
+                [{'id': 1000000, 'content': 'Skipped Sync Data'}, {'id': 2000000, 'content': 'Inserted Sync Data'}],
+                on_conflict=OnConflict.NOTHING)
+            self.sync_uow.commit()
+            assert keys == [None, 2000000]
+
+    def test_returned_keys_of_bulk_insert(self):
+        class Result:
+            def __init__(self, rows):
+                self.rows = rows
+
+            def fetchall(self):
+                return self.rows
+
+        batch = [{'id': 1, 'content': 'Skipped'}, {'id': 50, 'content': 'Inserted'}, {'content': 'Generated'}]
+        assert _returned_keys(Result([(50, 50), (51, 51)]), batch, 1, ['id']) == [None, 50, 51]
+        assert _returned_keys(Result([(7,), (8,)]), [{'content': 'a'}, {'content': 'b'}], 1, []) == [7, 8]
+
+    def test_bulk_upsert_for_sync_uow(self):
+        with self.sync_uow:
+            item = self.sync_uow.memo_repository.find_by_pk(1)
+            self.sync_uow.memo_repository.bulk_upsert([{'id': item.id, 'content': 'Upserted Sync Data'}])
+            self.sync_uow.commit()
+
+            self.sync_uow.session.expire_all()
+            assert self.sync_uow.memo_repository.find_by_pk(1).content == 'Upserted Sync Data'
+
+    @pytest.mark.asyncio
+    async def test_update_and_delete_where_for_async_uow(self):
+        async with self.uow:
+            await self.uow.memo_repository.bulk_insert([{'content': 'Stale Async Data'}] * 2)
+            items = await self.uow.memo_repository.find_all(content='Stale Async Data')
+
+            count = await self.uow.memo_repository.update_where({'content': 'Expired Async Data'},
+                                                                 content='Stale Async Data')
+            assert count == 2
+            assert [item.content for item in items] == ['Expired Async Data'] * 2
+
+            count = await self.uow.memo_repository.delete_where(content='Expired Async Data')
+            await self.uow.commit()
+            assert count == 2
+
+    def test_update_and_delete_where_for_sync_uow(self):
+        with self.sync_uow:
+            self.sync_uow.memo_repository.bulk_insert([{'content': 'Stale Sync Data'}] * 2)
+
+            count = self.sync_uow.memo_repository.update_where({'content': 'Expired Sync Data'},
+                                                               synchronize_session='fetch', content='Stale Sync Data')
+            assert count == 2
+
+            count = self.sync_uow.memo_repository.delete_where(synchronize_session=False, content='Expired Sync Data')
+            self.sync_uow.commit()
+            assert count == 2
+
+    def test_update_where_evaluates_loaded_entities_for_sync_uow(self):
+        with self.sync_uow:
+            self.sync_uow.memo_repository.bulk_insert([{'content': 'Loaded Sync Data'}])
+            item = self.sync_uow.memo_repository.find_all(content='Loaded Sync Data')[0]
+
+            self.sync_uow.memo_repository.update_where({'content': 'Evaluated Sync Data'}, content='Loaded Sync Data')
+            assert item.content == 'Evaluated Sync Data'
+
+            self.sync_uow.memo_repository.delete_where(content='Evaluated Sync Data')
+            self.sync_uow.commit()
+
+    @pytest.mark.asyncio
+    async def test_find_by_pks_for_async_uow(self):
+        async with self.uow:
+            first = await self.uow.memo_repository.find_by_pk(1)
+            items = await self.uow.memo_repository.find_by_pks([2, 0, 1], chunk_size=1)
+
+            assert items[0].id == 2
+            assert items[1] is None
+            assert items[2] is first
+
+    def test_find_by_pks_for_sync_uow(self):
+        with self.sync_uow:
+            items = self.sync_uow.memo_repository.find_by_pks([1, 2, 1])
+            assert [item.id for item in items] == [1, 2, 1]
+
+    @pytest.mark.asyncio
+    async def test_statement_cache_for_async_uow(self):
+        async with self.uow:
+            await self.uow.memo_repository.find_all(content='Sample Async Data')
+            hits = self.uow.memo_repository.statement_cache_info().hits
+
+            await self.uow.memo_repository.find_all(content='Practice Memo')
+            assert self.uow.memo_repository.statement_cache_info().hits == hits + 1
+
+    @pytest.mark.asyncio
+    async def test_composite_pk_for_async_uow(self):
+        async with self.uow:
+            await self.uow.memo_tag_repository.bulk_insert([{'memo_id': 1, 'name': 'python'},
+                                                             {'memo_id': 1, 'name': 'sqlalchemy'}])
+            await self.uow.commit()
+
+            item = await self.uow.memo_tag_repository.find_by_pk((1, 'python'))
+            assert item.name == 'python'
+
+            items = await self.uow.memo_tag_repository.find_by_pks([(1, 'sqlalchemy'), (2, 'python'), (1, 'python')])
+            assert items[0].name == 'sqlalchemy'
+            assert items[1] is None
+            assert items[2] is item
+
+            items = await self.uow.memo_tag_repository.find_by_pks([{'memo_id': 1, 'name': 'python'}])
+            assert items == [item]
+
+    @pytest.mark.asyncio
+    async def test_replica_routing_for_transactional(self):
+        replica = create_async_engine(self.async_db.engine.url)
+        uow = AsyncMemoUseCaseUnitOfWork(self.async_db.engine, AsyncReplicaRouter([replica]))
+
+        item = await MemoUseCase(uow).find_by_id(1)
+        assert item is not None
+        assert uow.session.bind is replica
+
+        item = await MemoUseCase(uow).create_memo(MemoRequest(content="Primary Memo"))
+        assert uow.session.bind is self.async_db.engine
+
+        await replica.dispose()
+
+    @pytest.mark.asyncio
+    async def test_entity_cache_for_async_uow(self):
+        async with self.uow:
+            await AsyncCachedMemoRepository(self.uow.session).find_by_pk(1)
+
+        async with self.uow:
+            repository = AsyncCachedMemoRepository(self.uow.session)
+            hits = repository.entity_cache_info().hits
+
+            item = await repository.find_by_pk(1)
+            assert repository.entity_cache_info().hits == hits + 1
+
+            repository.update(item, {'content': 'Cached Memo'})
+            await self.uow.commit()
+            assert repository.entity_cache_info().invalidations > 0
+
+        async with self.uow:
+            item = await AsyncCachedMemoRepository(self.uow.session).find_by_pk(1)
+            assert item.content == 'Cached Memo'
+
+    @pytest.mark.asyncio
+    async def test_entity_cache_keeps_session_changes_for_async_uow(self):
+        async with self.uow:
+            await AsyncCachedMemoRepository(self.uow.session).find_by_pk(2)
+
+        async with self.uow:
+            repository = AsyncCachedMemoRepository(self.uow.session)
+            item = await repository.find_by_pk(2)
+            item.content = 'Changed Cached Memo'
+
+            assert await repository.find_by_pk(2) is item
+            assert item.content == 'Changed Cached Memo'
+            assert item in self.uow.session.dirty
+
+    @pytest.mark.asyncio
+    async def test_entity_cache_skips_uncommitted_writes_for_async_uow(self):
+        item = await self.uc.create_memo(MemoRequest(content="Committed Cached Memo"))
+
+        async with self.uow:
+            repository = AsyncCachedMemoRepository(self.uow.session)
+            await repository.update_where({'content': 'Uncommitted Cached Memo'}, id=item.id)
+            assert (await repository.find_by_pk(item.id)).content == 'Uncommitted Cached Memo'
+            await self.uow.rollback()
+
+        async with self.uow:
+            cached = await AsyncCachedMemoRepository(self.uow.session).find_by_pk(item.id)
+            assert cached.content == 'Committed Cached Memo'
+
+    @pytest.mark.asyncio
+    async def test_async_entity_cache_backend_for_async_uow(self):
+        async with self.uow:
+            await self.uow.memo_tag_repository.bulk_insert([{'memo_id': 2, 'name': 'cached'}])
+            await self.uow.commit()
+
+        async with self.uow:
+            repository = AsyncCachedMemoTagRepository(self.uow.session)
+            await repository.delete(await repository.find_by_pk((2, 'cached')))
+            await self.uow.commit()
+
+            assert await repository.find_by_pk((2, 'cached')) is None
+
+    @pytest.mark.asyncio
+    async def test_query_instrumentation_for_async_uow(self):
+        sink = HistogramSink()
+        self.async_db.instrument(QueryInstrumentation(sink))
+        try:
+            async with self.uow:
+                await self.uow.memo_repository.find_by_pk(1)
+        finally:
+            self.async_db.instrument(None)
+
+        histograms = sink.snapshot()
+        assert sum(histogram.count for histogram in histograms.values()) == 1
+
+    def test_query_instrumentation_rows_for_sync_uow(self):
+        class ListSink(MetricsSink):
+            def __init__(self):
+                self.queries = []
+
+            def record(self, query):
+                self.queries.append(query)
+
+        sink = ListSink()
+        self.sync_db.instrument(QueryInstrumentation(sink, track_caller=False))
+        try:
+            with self.sync_uow:
+                self.sync_uow.memo_repository.bulk_insert([{'content': 'Counted Sync Data'}] * 2)
+                self.sync_uow.memo_repository.find_all(content='Counted Sync Data')
+                self.sync_uow.memo_repository.update_where({'content': 'Counted Sync Data'}, synchronize_session=False,
+                                                           content='Counted Sync Data')
+                self.sync_uow.commit()
+        finally:
+            self.sync_db.instrument(None)
+
+        rows = {query.fingerprint.split()[0]: query.rows for query in sink.queries}
+        assert rows["SELECT"] is None
+        assert rows["UPDATE"] == 2
+
+    def test_query_instrumentation_skips_unstarted_statements(self):
+        class Cursor:
+            rowcount = 1
+            description = None
+
+        sink = HistogramSink()
+        QueryInstrumentation(sink)._after_cursor_execute(None, Cursor(), "SELECT 1", {}, object(), False)
+        assert sink.snapshot() == {}